@@ -0,0 +1,92 @@
+"""
+Time to first pixel of a viewer window, by phase. Every run starts a fresh
+interpreter, so imports are measured cold (apart from the OS file cache).
+
+    python benchmarks/startup.py [--runs 5] [--backend matplotlib|qimage]
+
+Runs offscreen unless QT_QPA_PLATFORM is set. The phases are what the viewer
+process does for the first av() call; sending the array is not included.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+
+PHASES = ('import numpy', 'import PySide6', 'import pyArrView.ui', 'QApplication',
+          'backend', 'MainWindow', 'first frame')
+
+
+def measure():
+    "One cold start, in this process. Returns {phase: seconds}."
+    import time
+    times = {}
+    t = time.perf_counter()
+
+    def phase(name):
+        nonlocal t
+        now = time.perf_counter()
+        times[name] = now - t
+        t = now
+
+    import numpy as np
+    phase('import numpy')
+    from PySide6 import QtWidgets
+    phase('import PySide6')
+    import pyArrView.ui as ui
+    from pyArrView.ui.ImageViewer import ImageViewer, preload_backend
+    phase('import pyArrView.ui')
+    app = QtWidgets.QApplication([])
+    phase('QApplication')
+    preload_backend(ImageViewer.backend)
+    phase('backend')
+    array = np.random.default_rng(0).random((256, 256, 32), np.float32)
+    t = time.perf_counter()
+    window = ui.MainWindow(array)
+    phase('MainWindow')
+    window.show()
+    while window.viewer.cframe is None:
+        app.processEvents()
+    window.viewer.canvas.repaint()
+    phase('first frame')
+    window.close()
+    return times
+
+
+def run(runs, backend=None):
+    "Cold starts in fresh interpreters. Returns a {phase: seconds} dict per run."
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    if backend:
+        env['PYARRVIEW_BACKEND'] = backend
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, __file__, '--child'], env=env,
+                             capture_output=True, text=True, check=True).stdout
+        times = json.loads(out.splitlines()[-1])
+        times['total'] = sum(times.values())
+        results.append(times)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--backend', choices=('matplotlib', 'qimage'))
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure()))
+        return
+
+    runs = run(args.runs, args.backend)
+    print(f"{'phase':<22}{'median':>10}{'min':>10}  [ms]")
+    for name in PHASES + ('total',):
+        values = [r[name] for r in runs]
+        print(f"{name:<22}{statistics.median(values) * 1e3:>10.0f}{min(values) * 1e3:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
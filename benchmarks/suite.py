@@ -0,0 +1,440 @@
+"""
+Benchmarks of the viewer's hot paths on synthetic data, run offscreen and
+written as JSON so results can be compared between commits.
+
+    python benchmarks/suite.py -o results.json [--quick] [--only views,export]
+
+Some metrics are checks (CHECKS); the suite exits with status 1 if any of
+them fails, after writing the results, unless --no-checks is given.
+
+Benchmarks (--only takes their names):
+
+    transport   av() call latency and in-place update time vs. array size,
+                and the time the viewer takes to map the shared buffer
+    views       frame step time per view mode and backend, uncached (frame
+                computed on request) and cached; cached steps of frames up
+                to FPS_TARGET_PIXELS must reach FPS_TARGETS
+    wl          window/level change latency until redrawn (update_wl)
+    autolevel   auto_level on the displayed frame, until it is applied
+    complex2rgb throughput in Mpixel/s
+    frames      frame time and peak temporary allocation per pixel (tracemalloc)
+                of slicing, preparing and colormapping, per input dtype and
+                view mode; more than TEMP_BUDGET (plus TEMP_FIXED) is
+                reported as over budget
+    export      movie export frames/s and peak NumPy allocation (tracemalloc)
+    startup     cold start to first frame, see startup.py
+
+Frames range from 64x64 to 4096x4096 in 3 to 7 dimensions (complex64);
+--quick drops the two largest. Times are medians over repeats, in seconds.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import multiprocessing
+import statistics
+import subprocess
+import tracemalloc
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+
+# name: shape (rows, cols, dynamic, ...)
+DATASETS = {
+    '64x64 3D': (64, 64, 16),
+    '256x256 4D': (256, 256, 32, 4),
+    '1024x1024 5D': (1024, 1024, 8, 2, 2),
+    '2048x2048 6D': (2048, 2048, 4, 2, 1, 2),
+    '4096x4096 7D': (4096, 4096, 4, 1, 1, 1, 1),
+}
+QUICK = ('64x64 3D', '256x256 4D', '1024x1024 5D')
+VIEW_MODES = ('Real', 'Magnitude', 'Phase', 'Complex')
+BACKENDS = ('matplotlib', 'qimage')
+BENCHMARKS = ('transport', 'views', 'wl', 'autolevel', 'complex2rgb', 'frames', 'export', 'startup')
+# Input dtype: view modes measured by the frames benchmark
+FRAME_DTYPES = {
+    'uint8': ('Real',),
+    'int16': ('Real', 'Magnitude'),
+    'float16': ('Real',),
+    'float32': ('Real', 'Magnitude'),
+    'float64': ('Real',),
+    'complex64': ('Magnitude', 'Phase', 'Complex'),
+    'complex128': ('Magnitude', 'Complex'),
+}
+# Bytes per pixel a frame may allocate on top of the frame itself, plus a
+# fixed allowance for ufunc buffers (64 KiB each) and integer color tables.
+TEMP_BUDGET = 1.0
+TEMP_FIXED = 512 << 10
+# Frames per second that stepping through cached frames (the drawing path)
+# must reach per backend, for frames of up to FPS_TARGET_PIXELS. Redrawing
+# the whole figure per step managed 10-20 fps at 256x256.
+FPS_TARGETS = {'matplotlib': 24, 'qimage': 60}
+FPS_TARGET_PIXELS = 256 * 256
+# Boolean metrics that fail the run when False
+CHECKS = ('within_budget', 'meets_fps_target')
+
+
+def synthetic(shape, seed=0):
+    "Smooth complex images with noise, one per frame."
+    rng = np.random.default_rng(seed)
+    h, w = shape[:2]
+    y, x = np.ogrid[-1:1:h * 1j, -1:1:w * 1j]
+    base = (np.exp(-4 * (x ** 2 + y ** 2)) * np.exp(3j * x)).astype(np.complex64)
+    out = np.empty(shape, np.complex64)
+    frames = out.reshape(h, w, -1)
+    for i in range(frames.shape[2]):
+        frames[:, :, i] = base * (1 + 0.1 * i)
+        frames[:, :, i] += rng.standard_normal((h, w), np.float32) * 0.05
+    return out
+
+
+def timed(fn, repeat):
+    "Median wall time of fn() over repeat calls."
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return statistics.median(times)
+
+
+def log(*args):
+    print(*args, file=sys.stderr, flush=True)
+
+
+class Qt:
+    "One QApplication and helpers to wait on viewer windows."
+
+    def __init__(self):
+        from PySide6 import QtWidgets
+        import pyArrView.ui as ui
+        from pyArrView.ui.ImageViewer import ImageViewer
+        self.app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+        self.ui = ui
+        # Redraw as fast as possible, and compute only what is asked for.
+        ImageViewer.max_fps = 1e6
+        ImageViewer.prefetch_frames = 0
+
+    def wait(self, cond, timeout=120):
+        t = time.perf_counter()
+        while not cond():
+            self.app.processEvents()
+            if time.perf_counter() - t > timeout:
+                raise TimeoutError
+            time.sleep(0)
+
+    def window(self, array, backend):
+        w = self.ui.MainWindow(array)
+        w.resize(900, 800)
+        w.show()
+        w.viewer.set_backend(backend)
+        self.settle(w.viewer)
+        return w
+
+    def settle(self, viewer):
+        "Waits for the frame on screen and background statistics."
+        self.wait(lambda: viewer.cframe is not None and not viewer.dirty
+                  and viewer.wanted is None and viewer.computing is None
+                  and not viewer.levels_pending and not viewer.stats_building)
+
+    def step(self, viewer, delta=1):
+        "Moves along the dynamic dimension and waits for the frame; returns the time taken."
+        spin = viewer.dim_selector.dim_spinboxes[viewer.dim_selector.dynamic_dimension()]
+        shown = viewer.frames_shown
+        t = time.perf_counter()
+        spin.setValue((spin.value() + delta) % (spin.maximum() + 1))
+        self.wait(lambda: viewer.frames_shown != shown)
+        return time.perf_counter() - t
+
+
+def bench_transport(datasets, repeat):
+    from pyArrView import av, transport
+    results = []
+    for name, shape in datasets.items():
+        array = synthetic(shape)
+        handles = []
+
+        def call():
+            handles.append(av(array, name))
+
+        latency = timed(call, repeat)
+        update = timed(lambda: handles[-1].update(array), repeat)
+        source = transport.share(array)
+        open_time = timed(lambda: transport.open_array(source), repeat)
+        transport.release_array(source)
+        for h in handles:
+            h.close()
+        results.append(dict(benchmark='transport', params=dict(dataset=name, shape=shape, nbytes=array.nbytes),
+                            metrics=dict(av_s=latency, update_s=update, open_s=open_time,
+                                         av_gbps=array.nbytes / latency / 1e9)))
+        log(f"transport {name}: av {latency * 1e3:.1f} ms, update {update * 1e3:.1f} ms")
+    return results
+
+
+def bench_views(qt, datasets, repeat):
+    results = []
+    for name, shape in datasets.items():
+        array = synthetic(shape)
+        for backend in BACKENDS:
+            w = qt.window(array, backend)
+            v = w.viewer
+            for mode in VIEW_MODES:
+                v.viewmode_box.setCurrentText(mode)
+                qt.settle(v)
+                cold = []
+                for _ in range(repeat):
+                    v.frame_cache.clear()
+                    cold.append(qt.step(v))
+                # Back and forth between two frames that are cached now
+                qt.step(v, -1)
+                cached = [qt.step(v, (-1) ** k) for k in range(repeat)]
+                m = dict(uncached_s=statistics.median(cold), uncached_fps=1 / statistics.median(cold),
+                         cached_s=statistics.median(cached), cached_fps=1 / statistics.median(cached),
+                         factor=v.factor)
+                if shape[0] * shape[1] <= FPS_TARGET_PIXELS:
+                    m.update(fps_target=FPS_TARGETS[backend],
+                             meets_fps_target=m['cached_fps'] >= FPS_TARGETS[backend])
+                results.append(dict(benchmark='views', params=dict(dataset=name, shape=shape,
+                                                                   backend=backend, view=mode),
+                                    metrics=m))
+                log(f"views {name} {backend} {mode}: {m['uncached_fps']:.1f} fps uncached, "
+                    f"{m['cached_fps']:.1f} cached"
+                    + ("" if m.get('meets_fps_target', True) else f", BELOW {m['fps_target']} fps"))
+            w.close()
+            qt.app.processEvents()
+    return results
+
+
+def bench_wl(qt, datasets, repeat):
+    results = []
+    for name, shape in datasets.items():
+        array = synthetic(shape)
+        for backend in BACKENDS:
+            w = qt.window(array, backend)
+            v = w.viewer
+            for mode in ('Magnitude', 'Complex'):
+                v.viewmode_box.setCurrentText(mode)
+                qt.settle(v)
+
+                def change():
+                    v.wdw = 0.5 if v.wdw != 0.5 else 0.6
+                    v.update_wl()
+                    # The Complex view colorizes on the compute pool.
+                    qt.wait(lambda: v.wanted is None and v.computing is None)
+                    qt.app.processEvents()
+
+                t = timed(change, repeat)
+                results.append(dict(benchmark='wl', params=dict(dataset=name, shape=shape,
+                                                                backend=backend, view=mode),
+                                    metrics=dict(latency_s=t)))
+                log(f"wl {name} {backend} {mode}: {t * 1e3:.2f} ms")
+            w.close()
+            qt.app.processEvents()
+    return results
+
+
+def bench_autolevel(qt, datasets, repeat):
+    results = []
+    for name, shape in datasets.items():
+        w = qt.window(synthetic(shape), 'qimage')
+        v = w.viewer
+
+        def level():
+            v.auto_level()
+            qt.wait(lambda: not v.levels_pending)
+
+        t = timed(level, repeat)
+        results.append(dict(benchmark='autolevel', params=dict(dataset=name, shape=shape),
+                            metrics=dict(latency_s=t)))
+        log(f"autolevel {name}: {t * 1e3:.2f} ms")
+        w.close()
+        qt.app.processEvents()
+    return results
+
+
+def bench_complex2rgb(datasets, repeat):
+    from pyArrView.lut import complex2rgb
+    results = []
+    for name, shape in datasets.items():
+        frame = synthetic(shape[:2] + (1,))[:, :, 0]
+        out = None
+
+        def run():
+            nonlocal out
+            out, _ = complex2rgb(frame, out=out)
+
+        t = timed(run, repeat)
+        results.append(dict(benchmark='complex2rgb', params=dict(dataset=name, frame=shape[:2]),
+                            metrics=dict(time_s=t, mpix_per_s=frame.size / t / 1e6)))
+        log(f"complex2rgb {name}: {frame.size / t / 1e6:.1f} Mpix/s")
+    return results
+
+
+def bench_frames(datasets, repeat):
+    """
+    The viewer's per-frame work without Qt: read_frame, prepare_frame and
+    the LUT renderer (as in ImageViewer.compute_frame and render_rgb), with
+    warm scratch buffers. The prepared frame is kept (cached) by the viewer,
+    anything allocated beyond it is temporary.
+    """
+    from pyArrView.pipeline import ViewState, read_frame, prepare_frame
+    from pyArrView.lut import LutRenderer, get_lut
+    lut = get_lut('gray')
+    results = []
+    for name, shape in datasets.items():
+        base = synthetic(shape[:2] + (2,))
+        for dtype, views in FRAME_DTYPES.items():
+            if np.issubdtype(dtype, np.complexfloating):
+                data = base.astype(dtype)
+            elif np.issubdtype(dtype, np.integer):
+                data = (base.real * 100).astype(dtype)
+            else:
+                data = base.real.astype(dtype)
+            for view in views:
+                state = ViewState(view_type=view, clim=(0., 1.) if view == 'Complex' else None)
+                renderer = LutRenderer()
+                frame_i = 0
+
+                def run():
+                    nonlocal frame_i
+                    frame_i ^= 1
+                    frame = prepare_frame(read_frame(data, (slice(None), slice(None), slice(frame_i, frame_i + 1)),
+                                                     state), state)
+                    if not frame.flags.owndata:
+                        frame = frame.copy()
+                    if frame.ndim == 3:
+                        renderer.render_rgb(frame)
+                    else:
+                        renderer.render(frame, 0., 1., lut)
+                    return frame
+
+                run()
+                tracemalloc.start()
+                frame = run()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                t = timed(run, repeat)
+                pixels = shape[0] * shape[1]
+                temp = peak - frame.nbytes
+                ok = temp <= TEMP_BUDGET * pixels + TEMP_FIXED
+                results.append(dict(benchmark='frames', params=dict(dataset=name, frame=shape[:2], dtype=dtype, view=view),
+                                    metrics=dict(time_s=t, frame_bytes_per_px=frame.nbytes / pixels,
+                                                 temp_bytes=temp, temp_bytes_per_px=temp / pixels,
+                                                 within_budget=ok)))
+                log(f"frames {name} {dtype} {view}: {t * 1e3:.1f} ms, temporary {temp / 2**10:.0f} KiB"
+                    f" ({temp / pixels:.2f} B/px)" + ("" if ok else " OVER BUDGET"))
+    return results
+
+
+def bench_export(qt, datasets):
+    import shutil
+    from pyArrView.export import write_movie
+    formats = ['.npy'] + (['.mp4'] if shutil.which('ffmpeg') else [])
+    results = []
+    for name, shape in datasets.items():
+        w = qt.window(synthetic(shape), 'qimage')
+        v = w.viewer
+        dim_i = v.dim_selector.dynamic_dimension()
+        n = v.image_shape()[dim_i]
+        for ext in formats:
+            with tempfile.TemporaryDirectory() as tmp:
+                frames = v.movie_frames(v.dim_selector.get_current_slices(), dim_i,
+                                        v.view_state()._replace(factor=1, montage=None),
+                                        v.window_level(), v.cmap)
+                tracemalloc.start()
+                t = time.perf_counter()
+                write_movie(frames, os.path.join(tmp, 'movie' + ext), 10, n)
+                t = time.perf_counter() - t
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            results.append(dict(benchmark='export', params=dict(dataset=name, shape=shape, format=ext, frames=n),
+                                metrics=dict(time_s=t, fps=n / t, peak_bytes=peak)))
+            log(f"export {name} {ext}: {n / t:.1f} frames/s, peak {peak / 2**20:.0f} MiB")
+        w.close()
+        qt.app.processEvents()
+    return results
+
+
+def bench_startup(repeat):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import startup
+    results = []
+    for backend in BACKENDS:
+        runs = startup.run(repeat, backend)
+        metrics = {f'{phase}_s': statistics.median(r[phase] for r in runs) for phase in runs[0]}
+        results.append(dict(benchmark='startup', params=dict(backend=backend), metrics=metrics))
+        log(f"startup {backend}: {metrics['total_s'] * 1e3:.0f} ms")
+    return results
+
+
+def environment():
+    from PySide6 import __version__ as pyside
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return dict(time=time.strftime('%Y-%m-%dT%H:%M:%S'), commit=commit, python=platform.python_version(),
+                numpy=np.__version__, pyside6=pyside, platform=platform.platform(),
+                cpus=os.cpu_count(), qpa=os.environ['QT_QPA_PLATFORM'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-o', '--output', help="JSON file to write (default: stdout)")
+    parser.add_argument('--only', help="comma-separated benchmarks: " + ','.join(BENCHMARKS))
+    parser.add_argument('--quick', action='store_true', help="skip the 2048 and 4096 datasets")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--no-checks', action='store_true', help="exit with status 0 even if checks fail")
+    args = parser.parse_args()
+
+    # The viewer process av() starts must not be forked from this one once
+    # it has a QApplication.
+    multiprocessing.set_start_method('spawn')
+    selected = args.only.split(',') if args.only else BENCHMARKS
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    datasets = {k: v for k, v in DATASETS.items() if not args.quick or k in QUICK}
+
+    results = []
+    qt = Qt() if {'views', 'wl', 'autolevel', 'export'} & set(selected) else None
+    for name in selected:
+        if name == 'transport':
+            results += bench_transport(datasets, args.repeat)
+        elif name == 'views':
+            results += bench_views(qt, datasets, args.repeat)
+        elif name == 'wl':
+            results += bench_wl(qt, datasets, args.repeat * 4)
+        elif name == 'autolevel':
+            results += bench_autolevel(qt, datasets, args.repeat)
+        elif name == 'complex2rgb':
+            results += bench_complex2rgb(datasets, args.repeat)
+        elif name == 'frames':
+            results += bench_frames(datasets, args.repeat)
+        elif name == 'export':
+            results += bench_export(qt, datasets)
+        elif name == 'startup':
+            results += bench_startup(args.repeat)
+
+    report = json.dumps(dict(environment=environment(), results=results), indent=1)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    else:
+        print(report)
+
+    failed = [r for r in results if not all(r['metrics'].get(c, True) for c in CHECKS)]
+    for r in failed:
+        log(f"FAILED {r['benchmark']} {r['params']}: "
+            + ', '.join(c for c in CHECKS if not r['metrics'].get(c, True)))
+    if failed and not args.no_checks:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,4 @@
-from .arrView import av
+from .arrView import av, prewarm, ViewerHandle
+from .headless import render, export_slices
 
-__all__ = ['av']
\ No newline at end of file
+__all__ = ['av', 'prewarm', 'ViewerHandle', 'render', 'export_slices']
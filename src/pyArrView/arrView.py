@@ -1,94 +1,236 @@
 #!/usr/bin/env python
+import os
 import sys
+import math
 import logging
 import numpy.typing as npt
 import numpy as np
 import multiprocessing as mp
 import atexit
-from queue import Empty
+import itertools
+import threading
+from . import transport, protocol, profiling
 
-# Global process and queue
+# Global process and the write end of its command pipe
 _qt_process = None
-_command_queue = None
+_command_conn = None
+_send_lock = threading.Lock()
+_window_ids = itertools.count(1)
 
-def _qt_process_main(command_queue):
-    """Main function for the Qt process."""
-    from PySide6.QtCore import Qt, QTimer
+def _qt_process_main(command_conn, listener=None):
+    """
+    Main function for the Qt process. With a listener (the daemon), clients
+    connect to it instead, and the process outlives them.
+    """
     from PySide6 import QtWidgets
     import pyArrView.ui as ui
+
+    # A forked child inherits our write end; drop it so that the reader sees
+    # EOF when the calling process goes away.
+    if _command_conn is not None:
+        _command_conn.close()
     
     # Create Qt application in this process's main thread
     app = QtWidgets.QApplication(sys.argv)
     app.setQuitOnLastWindowClosed(False)
-    
-    windows = []
-    
-    def check_commands():
-        """Check for new window creation commands."""
-        try:
-            while True:
-                cmd = command_queue.get_nowait()
-                if cmd is None:  # Shutdown signal
-                    # Close all windows first
-                    for w in windows[:]:
-                        w.close()
-                    # Quit the application
-                    app.quit()
-                    return
-                
-                cmd_type, array, title = cmd
-                if cmd_type == 'create':
-                    main = ui.MainWindow(array)
-                    main.setWindowTitle(title)
-                    main.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
-                    main.destroyed.connect(lambda w=main: windows.remove(w) if w in windows else None)
-                    windows.append(main)
-                    main.resize(800, 600)
-                    main.show()
-                    main.raise_()
-                    main.activateWindow()
-        except Empty:
-            pass
-    
-    # Check for commands periodically
-    timer = QTimer()
-    timer.timeout.connect(check_commands)
-    timer.start(10)  # Check every 10ms for faster response
+
+    trace = os.environ.get('PYARRVIEW_TRACE')
+    if trace:
+        profiling.start_trace(trace)
+
+    # Commands are read on a background thread and dispatched on this one
+    manager = ui.WindowManager(command_conn, app, persistent=listener is not None)
+    if listener is not None:
+        from .daemon import accept_clients
+        threading.Thread(target=accept_clients, args=(listener, manager),
+                         name='pyArrView-accept', daemon=True).start()
+
+    # Commands queue up while the display backend loads; the first window
+    # needs it anyway, and when prewarmed it is loaded before av() is called.
+    from pyArrView.ui.ImageViewer import ImageViewer, preload_backend
+    preload_backend(ImageViewer.backend)
     
     # Run the Qt event loop
-    sys.exit(app.exec())
+    status = app.exec()
+    profiling.stop_trace()
+    sys.exit(status)
 
 def _ensure_qt_process():
-    """Ensure the Qt process is running."""
-    global _qt_process, _command_queue
+    """Ensure the Qt process (or with PYARRVIEW_DAEMON=1, the daemon) is running."""
+    global _qt_process, _command_conn
+
+    # Imported here, python -m pyArrView.daemon must find it not yet imported.
+    from . import daemon
+    if daemon.enabled():
+        if _command_conn is None:
+            _command_conn = daemon.start()
+        return
     
     if _qt_process is None or not _qt_process.is_alive():
-        _command_queue = mp.Queue()
-        _qt_process = mp.Process(target=_qt_process_main, args=(_command_queue,), daemon=True)
+        reader, _command_conn = mp.Pipe(duplex=False)
+        _qt_process = mp.Process(target=_qt_process_main, args=(reader,), daemon=True)
         _qt_process.start()
+        # The child holds its own copy; closing ours lets it see EOF if we die.
+        reader.close()
+
+def _send(cmd):
+    """Send a command to the Qt process. Safe to call from several threads."""
+    global _command_conn
+    with _send_lock:
+        try:
+            _command_conn.send(cmd)
+        except OSError:
+            if _qt_process is None:
+                # The daemon went away; the next av() starts a new one.
+                _command_conn.close()
+                _command_conn = None
+            raise
+    if _qt_process is None:
+        # The daemon may open the array after we exit, keep the file.
+        transport.hand_over(getattr(cmd, 'source', None))
 
 def _cleanup():
     """Clean up Qt process on exit."""
-    global _qt_process, _command_queue
-    
     # Since the process is daemon, it will be killed when main exits
     # Just try to send shutdown signal but don't wait
     if _qt_process is not None and _qt_process.is_alive():
         try:
-            _command_queue.put(None, block=False)
+            _send(protocol.Shutdown())
         except Exception:
             pass
 
 atexit.register(_cleanup)
+atexit.register(transport.cleanup)
 
-def av(array: npt.ArrayLike, title: str = "pyArrView"):
+class ViewerHandle:
+    """
+    Handle to a window opened by av(), for updating it from the calling
+    process, e.g. to follow an iterative reconstruction.
+
+    Windows showing an array passed through a shared buffer keep that
+    buffer: updating with an array of the same shape and dtype copies the
+    data into it in place and only sends a short notification. The viewer
+    may read while the copy is in progress, so a frame can briefly show a
+    mix of two updates.
+
+    Windows showing several arrays (av([a, b, ...])) are updated with a list
+    of arrays in the same way.
+    """
+
+    def __init__(self, window_id, source, grid=False):
+        self.window_id = window_id
+        self._grid = grid
+        self._attach(source)
+
+    def _attach(self, source):
+        self._source = source
+        self._buffer = None
+        if isinstance(source, transport.SharedArray) and source.owned:
+            self._buffer = source.open(writable=True)
+
+    def update(self, array: npt.ArrayLike):
+        """
+        Replaces the window's data, keeping slice selection, window/level and
+        colormap if the shape is unchanged.
+        """
+        if self._grid:
+            self._update_grid([np.asarray(a) for a in array])
+            return
+        if self._buffer is not None:
+            array = np.asarray(array)
+            if array.shape == self._buffer.shape and array.dtype == self._buffer.dtype:
+                np.copyto(self._buffer, array)
+                _send(protocol.UpdateData(self.window_id))
+                return
+        # New layout: the viewer frees the old buffer once it has switched.
+        source = transport.share(array)
+        _send(protocol.UpdateData(self.window_id, source))
+        self._attach(source)
+
+    def _update_grid(self, arrays):
+        buf = self._buffer
+        if buf is not None and (*arrays[0].shape, len(arrays)) == buf.shape \
+                and all(a.shape == arrays[0].shape for a in arrays) \
+                and np.result_type(*arrays) == buf.dtype:
+            for i, a in enumerate(arrays):
+                np.copyto(buf[..., i], a)
+            _send(protocol.UpdateData(self.window_id))
+            return
+        source = transport.share_stack(arrays)
+        _send(protocol.UpdateData(self.window_id, source))
+        self._attach(source)
+
+    def set_title(self, title: str):
+        _send(protocol.SetTitle(self.window_id, title))
+
+    def set_view(self, view: str = None, cmap: str = None, wl=None, backend: str = None,
+                 scaling: str = None):
+        """
+        Changes display settings of the window.
+
+        Args:
+            view: View type, e.g. 'Magnitude', 'Phase', 'Real'
+            cmap: matplotlib colormap name
+            wl: (min, max) display range
+            backend: 'matplotlib' or 'qimage'
+            scaling: 'global' (one window/level for all frames) or 'frame'
+                     (auto-contrast every frame)
+        """
+        options = dict(view=view, cmap=cmap, wl=wl, backend=backend, scaling=scaling)
+        _send(protocol.SetView(self.window_id,
+                               {k: v for k, v in options.items() if v is not None}))
+
+    def close(self):
+        _send(protocol.CloseWindow(self.window_id))
+        self._buffer = None
+        self._source = None
+
+def prewarm():
+    """
+    Starts the viewer process in the background, so that the first av() call
+    does not wait for it to import Qt and matplotlib. Done on import when
+    PYARRVIEW_PREWARM=1. With PYARRVIEW_DAEMON=1, connects to the daemon,
+    starting it if needed.
+    """
+    _ensure_qt_process()
+
+def _is_array_list(obj):
+    return isinstance(obj, (list, tuple)) and len(obj) > 0 \
+        and all(isinstance(a, np.ndarray) for a in obj)
+
+def _grid_columns(n, layout):
+    "Columns of the grid of n arrays for av()'s layout argument."
+    if layout is None:
+        return math.ceil(math.sqrt(n))
+    if layout == 'row':
+        return n
+    if layout == 'column':
+        return 1
+    rows, cols = layout
+    if rows * cols < n:
+        raise ValueError(f"A {rows}x{cols} layout cannot hold {n} arrays")
+    return cols
+
+def av(array: npt.ArrayLike, title: str = "pyArrView", key: str = None,
+       layout=None) -> ViewerHandle:
     """
     Create a new pyArrView window in a non-blocking way.
     Multiple windows can be created by calling this function multiple times.
     
     Args:
-        array: N-dimensional array to visualize
+        array: N-dimensional array to visualize, or the path of a .npy, .mat
+               or .h5 file. Files and np.memmap arrays are opened memory-mapped
+               by the viewer instead of being loaded. A list of arrays of the
+               same shape opens one window showing them side by side, sliced
+               together and with one window/level.
         title: Window title
+        key: Variable or dataset to show from a .mat/.h5 file. Defaults to the
+             largest one.
+        layout: Arrangement of a list of arrays: (rows, columns), 'row' or
+                'column'. Defaults to a roughly square grid.
+
+    Returns:
+        A ViewerHandle to update, retitle or close the window.
     """
     logging.basicConfig(
         format='[%(levelname)s] %(message)s',
@@ -97,12 +239,28 @@ def av(array: npt.ArrayLike, title: str = "pyArrView"):
 
     _ensure_qt_process()
     
-    # Convert to numpy array if needed
-    array = np.asarray(array)
-    
-    # Send command to create window in Qt process (array will be pickled)
-    _command_queue.put(('create', array, title))
+    # Files and memmaps are passed by reference, large arrays go through a
+    # shared memory-mapped file, only their description is pickled. Small
+    # ones are cheaper to pickle directly.
+    window_id = next(_window_ids)
+    if _is_array_list(array):
+        if array[0].ndim < 2:
+            raise ValueError("Arrays shown side by side need at least two dimensions")
+        # One buffer for all of them, stacked along a new last axis
+        grid = _grid_columns(len(array), layout)
+        source = transport.share_stack(array)
+        _send(protocol.CreateWindow(window_id, source, title, grid))
+        return ViewerHandle(window_id, source, grid=True)
+    if layout is not None:
+        raise ValueError("layout applies to a list of arrays")
+    source = transport.share(array, key)
+    _send(protocol.CreateWindow(window_id, source, title))
+    return ViewerHandle(window_id, source)
+
 
+# Not in child processes, they import this module too.
+if os.environ.get('PYARRVIEW_PREWARM') == '1' and mp.parent_process() is None:
+    prewarm()
 
 if __name__ == '__main__':
     input = np.random.rand(10, 10, 10, 10, 10)
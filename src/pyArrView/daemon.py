@@ -0,0 +1,162 @@
+"""
+Optional viewer daemon: one long-lived viewer process per user that every
+Python process (scripts, Jupyter kernels, ...) connects to over a Unix
+domain socket, instead of each starting its own. Only the first av() pays
+for importing Qt and matplotlib; later ones just connect.
+
+Enabled with PYARRVIEW_DAEMON=1; av() then starts the daemon if it is not
+running. Arrays reach it the usual way (see transport), through shared
+memory-mapped files, so only their description goes over the socket. Windows
+stay open when the process that opened them exits.
+
+    python -m pyArrView.daemon          # run in the foreground
+    python -m pyArrView.daemon stop     # close all windows and quit
+
+The socket lives in a directory only the user can access
+($XDG_RUNTIME_DIR or the temp directory); PYARRVIEW_SOCKET overrides its
+path. POSIX only.
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+import subprocess
+from multiprocessing.connection import Listener, Client
+
+from . import protocol
+
+# Seconds start() waits for a newly launched daemon to accept connections.
+START_TIMEOUT = 30
+
+
+def enabled():
+    "Whether av() should go through the daemon."
+    return os.environ.get('PYARRVIEW_DAEMON') == '1' and os.name == 'posix'
+
+
+def runtime_dir():
+    "Private directory for the socket, lock and log files."
+    base = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    path = os.path.join(base, f'pyArrView-{os.getuid()}')
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.stat(path)
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        # Anyone who can connect can make the daemon unpickle anything.
+        raise PermissionError(f"{path} must be owned by and private to the current user")
+    return path
+
+
+def socket_path():
+    return os.environ.get('PYARRVIEW_SOCKET') or os.path.join(runtime_dir(), 'viewer.sock')
+
+
+def connect(path=None):
+    "Connection to a running daemon, or None."
+    try:
+        return Client(path or socket_path(), 'AF_UNIX')
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+
+
+def launch(path=None):
+    "Starts a daemon in the background, detached from this process."
+    path = path or socket_path()
+    env = dict(os.environ)
+    # It imports pyArrView too, and must not try to prewarm itself.
+    env.pop('PYARRVIEW_PREWARM', None)
+    # Find this copy of pyArrView even if it is not installed.
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_parent, env.get('PYTHONPATH')]))
+    log = open(os.path.join(os.path.dirname(path), 'viewer.log'), 'ab')
+    with log:
+        subprocess.Popen([sys.executable, '-m', 'pyArrView.daemon', 'serve', path],
+                         env=env, stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+                         start_new_session=True, close_fds=True)
+
+
+def start(path=None, timeout=START_TIMEOUT):
+    """
+    Connects to the daemon, launching it first if it is not running. The
+    daemon listens before it imports Qt, so this returns as soon as the
+    process is up; commands queue until it is ready.
+    """
+    path = path or socket_path()
+    conn = connect(path)
+    if conn is not None:
+        return conn
+    logging.info("Starting the pyArrView daemon...")
+    launch(path)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        conn = connect(path)
+        if conn is not None:
+            return conn
+        time.sleep(0.01)
+    raise TimeoutError(f"The pyArrView daemon did not start, see {os.path.dirname(path)}/viewer.log")
+
+
+def stop(path=None):
+    "Closes all windows of the daemon and makes it quit. Returns whether one was running."
+    conn = connect(path)
+    if conn is None:
+        return False
+    with conn:
+        conn.send(protocol.Shutdown())
+    return True
+
+
+def accept_clients(listener, manager):
+    "Runs on a thread of the daemon, handing every new connection to the window manager."
+    while True:
+        try:
+            conn = listener.accept()
+        except OSError:
+            # Listener closed on shutdown
+            return
+        manager.listen(conn)
+
+
+def serve(path=None):
+    """
+    Runs the daemon in this process until it is told to shut down. Returns
+    right away if another daemon holds the socket.
+    """
+    import fcntl
+    path = path or socket_path()
+    lock = open(path + '.lock', 'w')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        logging.info(f"A pyArrView daemon is already serving {path}")
+        return
+    # Holding the lock, any socket file left is from a daemon that died.
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    old_umask = os.umask(0o177)
+    try:
+        listener = Listener(path, 'AF_UNIX')
+    finally:
+        os.umask(old_umask)
+    logging.info(f"pyArrView daemon listening on {path}")
+    from .arrView import _qt_process_main
+    try:
+        _qt_process_main(None, listener)
+    finally:
+        # Closes and removes the socket
+        listener.close()
+        lock.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='[%(levelname)s] %(message)s', level='INFO')
+    command = sys.argv[1] if len(sys.argv) > 1 else 'serve'
+    if command == 'serve':
+        serve(sys.argv[2] if len(sys.argv) > 2 else None)
+    elif command == 'stop':
+        if not stop(sys.argv[2] if len(sys.argv) > 2 else None):
+            print("No pyArrView daemon is running.")
+    else:
+        sys.exit(f"Unknown command {command!r}, expected serve or stop")
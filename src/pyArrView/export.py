@@ -0,0 +1,159 @@
+import os
+import shutil
+import logging
+import subprocess
+import numpy as np
+
+# Containers written by piping raw frames into ffmpeg.
+FFMPEG_FORMATS = ('.mp4', '.mkv', '.mov', '.avi', '.webm', '.gif', '.apng')
+# Written with Pillow when ffmpeg is not installed.
+PILLOW_FORMATS = ('.gif', '.apng')
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def movie_backend(path):
+    """
+    How MovieWriter writes path: 'npy', 'ffmpeg' or 'pillow'. Raises the
+    error MovieWriter would, so a file dialog can check the choice before
+    any frame is rendered.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.npy':
+        return 'npy'
+    if ext in FFMPEG_FORMATS and shutil.which('ffmpeg') is not None:
+        return 'ffmpeg'
+    if ext in PILLOW_FORMATS:
+        return 'pillow'
+    if ext in FFMPEG_FORMATS:
+        raise RuntimeError(f"ffmpeg is required to write {ext} files. Use .gif, .apng or .npy instead.")
+    raise ValueError(f"Unsupported movie format: {path}")
+
+
+class MovieWriter:
+    """
+    Writes uint8 RGB(A) frames one at a time, so memory use does not grow
+    with the number of frames. The format follows the file extension:
+
+    - .mp4/.mkv/.mov/.avi/.webm/.gif/.apng: raw frames piped to ffmpeg
+    - .npy: an (n, H, W, C) uint8 stack written through a memory map
+    - .gif/.apng without ffmpeg: Pillow, which keeps the frames in memory
+      (palette frames for GIF, full color for APNG)
+    """
+
+    def __init__(self, path, fps, n_frames, frame_shape):
+        self.path = path
+        self.fps = fps
+        self.n_frames = n_frames
+        self.height, self.width, self.channels = frame_shape
+        self.proc = None
+        self.stack = None
+        self.pil_frames = None
+        self.count = 0
+
+        self.ext = os.path.splitext(path)[1].lower()
+        backend = movie_backend(path)
+        if backend == 'npy':
+            self.stack = np.lib.format.open_memmap(
+                path, mode='w+', dtype=np.uint8, shape=(n_frames, *frame_shape))
+        elif backend == 'ffmpeg':
+            self.proc = subprocess.Popen(self.ffmpeg_args(shutil.which('ffmpeg'), self.ext),
+                                         stdin=subprocess.PIPE,
+                                         stdout=subprocess.DEVNULL,
+                                         stderr=subprocess.PIPE)
+        else:
+            logging.warning(f"ffmpeg not found, writing the {self.ext} with Pillow (frames are kept in memory).")
+            self.pil_frames = []
+
+    def ffmpeg_args(self, ffmpeg, ext):
+        pix_fmt = 'rgba' if self.channels == 4 else 'rgb24'
+        args = [ffmpeg, '-y', '-loglevel', 'error',
+                '-f', 'rawvideo', '-pix_fmt', pix_fmt,
+                '-s', f'{self.width}x{self.height}', '-r', str(self.fps),
+                '-i', '-']
+        if ext == '.gif':
+            args += ['-vf', 'split[a][b];[a]palettegen[p];[b][p]paletteuse']
+        elif ext == '.apng':
+            args += ['-f', 'apng', '-plays', '0']
+        else:
+            # yuv420p (what players expect) needs even dimensions.
+            args += ['-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p']
+        return args + [self.path]
+
+    def write(self, frame):
+        if self.proc is not None:
+            try:
+                self.proc.stdin.write(np.ascontiguousarray(frame).data)
+            except BrokenPipeError:
+                raise RuntimeError(f"ffmpeg failed: {self.proc.stderr.read().decode()}")
+        elif self.stack is not None:
+            self.stack[self.count] = frame
+        else:
+            from PIL import Image
+            if self.ext == '.gif':
+                self.pil_frames.append(Image.fromarray(frame[..., :3]).quantize())
+            else:
+                # A copy: the image would share frame's memory, which the
+                # renderer reuses for the next frame.
+                self.pil_frames.append(Image.fromarray(np.array(frame)))
+        self.count += 1
+
+    def close(self):
+        if self.proc is not None:
+            self.proc.stdin.close()
+            if self.proc.wait() != 0:
+                raise RuntimeError(f"ffmpeg failed: {self.proc.stderr.read().decode()}")
+            self.proc.stderr.close()
+        elif self.stack is not None:
+            self.stack.flush()
+            self.stack = None
+        elif self.pil_frames:
+            self.pil_frames[0].save(self.path, 'GIF' if self.ext == '.gif' else 'PNG', save_all=True,
+                                    append_images=self.pil_frames[1:],
+                                    duration=1e3 / self.fps, loop=0)
+            self.pil_frames = None
+
+    def abort(self):
+        "Stops writing and removes the partial file."
+        if self.proc is not None:
+            self.proc.kill()
+            self.proc.wait()
+        self.stack = None
+        self.pil_frames = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def write_movie(frames, path, fps, n_frames, progress=None):
+    """
+    Streams frames to a movie file.
+
+    Parameters:
+        frames:         iterable of m-by-n-by-3/4 uint8 frames
+        path:           output file, the extension selects the format
+        fps:            frame rate
+        n_frames:       number of frames the iterable yields
+        progress:       optional callable(i) called after each frame;
+                        returning False cancels the export
+
+    Raises:
+        ExportCancelled if progress asked to stop; the partial file is removed.
+    """
+    writer = None
+    try:
+        for i, frame in enumerate(frames):
+            if writer is None:
+                writer = MovieWriter(path, fps, n_frames, frame.shape)
+            writer.write(frame)
+            if progress is not None and progress(i + 1) is False:
+                raise ExportCancelled()
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    if writer is not None:
+        writer.close()
@@ -0,0 +1,236 @@
+"""
+Rendering without a window, e.g. for reports: the viewer's frame pipeline
+(see pipeline), window/level and colormap turn a slice into a uint8 RGB
+image. Nothing here imports Qt.
+
+- render: one frame to an array
+- export_slices: every frame of an array to image files, on a process pool
+"""
+import os
+import logging
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from . import transport
+from .lut import get_lut, LutRenderer
+from .stats import frame_percentiles, volume_histogram
+from .pipeline import VALUE_TRANSFORMS, ViewState, read_frame, prepare_frame, complex_source
+
+# Frames handed to a worker at a time; small enough to balance the load,
+# large enough that the round trips do not matter.
+BATCH_SIZE = 16
+
+# zlib level of exported PNGs. Encoding dominates the export; level 1 is
+# about 3x faster than Pillow's default 6 for slightly larger files.
+PNG_COMPRESS_LEVEL = 1
+
+
+def frame_slices(shape, slices=None):
+    """
+    Normalizes a frame selection to one slice per dimension. Integers pick
+    one index, slices keep their range; missing trailing entries are 0. The
+    default is the viewer's first frame: the first two dimensions whole.
+    """
+    if slices is None:
+        slices = (slice(None),) * min(2, len(shape))
+    if not isinstance(slices, tuple):
+        slices = (slices,)
+    if len(slices) > len(shape):
+        raise IndexError(f"{len(slices)} indices for an array of {len(shape)} dimensions")
+    slices = slices + (0,) * (len(shape) - len(slices))
+    out = []
+    for n, s in zip(shape, slices):
+        if isinstance(s, slice):
+            out.append(slice(*s.indices(n)))
+        else:
+            i = range(n)[s]
+            out.append(slice(i, i + 1))
+    return tuple(out)
+
+
+def view_state(dtype, view=None, **options):
+    """
+    ViewState for render; view defaults to the viewer's ('Magnitude' for
+    complex data or a Fourier transform, 'Real' otherwise). options are
+    other ViewState fields, e.g. transpose=True or transform=('FFT', (0, 1)).
+    """
+    if view is None:
+        spectrum = options.get('transform') is not None
+        view = 'Magnitude' if np.issubdtype(dtype, np.complexfloating) or spectrum else 'Real'
+    if view not in VALUE_TRANSFORMS:
+        raise ValueError(f"Unknown view {view!r}, expected one of {', '.join(VALUE_TRANSFORMS)}")
+    unknown = set(options) - set(ViewState._fields)
+    if unknown:
+        raise TypeError(f"Unknown view options: {', '.join(sorted(unknown))}")
+    # Always full resolution and one frame.
+    return ViewState(view_type=view, **options)._replace(factor=1, montage=None)
+
+
+def render_frame(cimg, state: ViewState, cmap='gray', wl=None, renderer=None):
+    """
+    Windows and colormaps a 2D frame as read_frame returns it. wl is the
+    (min, max) display range, of the magnitude for the Complex view; None
+    auto-contrasts the frame (2nd to 98th percentile) like the viewer.
+
+    Returns:
+        rgb:            the m-by-n-by-3 uint8 image
+    """
+    if renderer is None:
+        renderer = LutRenderer()
+    if state.view_type == 'Complex':
+        if wl is None:
+            wl = frame_percentiles(np.abs(complex_source(cimg, state)), (2, 98))
+        state = state._replace(clim=tuple(map(float, wl)))
+    frame = prepare_frame(cimg, state)
+    if frame.ndim == 3:
+        rgba = renderer.render_rgb(frame)
+    else:
+        # Frames are mostly strided views into the array; one copy makes
+        # the percentile and LUT passes several times faster.
+        frame = np.ascontiguousarray(frame)
+        if wl is None:
+            wl = frame_percentiles(frame, (2, 98))
+        rgba = renderer.render(frame, wl[0], wl[1], get_lut(cmap))
+    return np.ascontiguousarray(rgba[..., :3])
+
+
+def render(array, slices=None, view=None, cmap='gray', wl=None, **options):
+    """
+    Renders one frame of an array the way the viewer shows it.
+
+    Args:
+        array: N-dimensional array, e.g. np.load(path, mmap_mode='r')
+        slices: Frame to show, one index or slice per dimension; the two
+                dimensions with more than one element become rows and
+                columns. Defaults to the first two dimensions at index 0 of
+                the others.
+        view: 'Magnitude', 'Phase', 'Real', 'Imag' or 'Complex'
+        cmap: matplotlib colormap name, not used by the Complex view
+        wl: (min, max) display range; None auto-contrasts the frame
+        options: other pipeline.ViewState fields, e.g. transpose=True,
+                 nrot=1, projection=(2, 'MIP') or transform=('FFT', (0, 1))
+
+    Returns:
+        The m-by-n-by-3 uint8 RGB image.
+    """
+    if not isinstance(array, np.ndarray):
+        array = np.asarray(array)
+    slices = frame_slices(array.shape, slices)
+    state = view_state(array.dtype, view, **options)
+    cimg = read_frame(array, slices, state)
+    if cimg.ndim != 2:
+        raise ValueError(f"slices select a frame of shape {cimg.shape}, not a 2D image")
+    return render_frame(cimg, state, cmap, wl)
+
+
+# Per-process state of the export workers, set by _init_worker.
+_worker = {}
+
+
+def _init_worker(source, state, cmap, wl):
+    _worker.update(data=transport.open_array(source), state=state, cmap=cmap, wl=wl,
+                   renderer=LutRenderer())
+
+
+def is_gray(cmap):
+    "Whether a colormap only has gray levels, so images can be saved with one channel."
+    lut = get_lut(cmap)
+    return bool((lut[:, 0] == lut[:, 1]).all() and (lut[:, 1] == lut[:, 2]).all())
+
+
+def _export_batch(jobs):
+    "Renders and writes (slices, path) jobs. Runs in a worker process, or inline."
+    from PIL import Image
+    w = _worker
+    gray = w['state'].view_type != 'Complex' and is_gray(w['cmap'])
+    for slices, path in jobs:
+        rgb = render_frame(read_frame(w['data'], slices, w['state']), w['state'],
+                           w['cmap'], w['wl'], w['renderer'])
+        Image.fromarray(rgb[..., 0] if gray else rgb).save(path, compress_level=PNG_COMPRESS_LEVEL)
+    return len(jobs)
+
+
+def export_slices(array, directory, slices=None, dims=None, fmt='png', prefix='slice',
+                  view=None, cmap='gray', wl=None, scaling='frame', processes=None,
+                  progress=None, **options):
+    """
+    Renders every frame of an array to an image file, spread over a pool of
+    processes. The array is passed to them like to the viewer (memmaps by
+    reference, other arrays through one shared buffer), so it is not copied
+    per process.
+
+    Args:
+        array: N-dimensional array
+        directory: Output directory, created if needed
+        slices: Frame selection as for render; it fixes the rows and columns
+                and the index of dimensions not in dims
+        dims: Dimensions to step through; defaults to all but rows and columns
+        fmt: File extension, any format Pillow writes (png, tiff, jpg, ...)
+        prefix: File names are prefix_i_j....fmt with the zero-padded
+                indices along dims
+        view, cmap, wl, options: as for render
+        scaling: Without wl, 'frame' auto-contrasts every frame and 'global'
+                 uses one range for the whole array
+        processes: Pool size, defaults to the number of cores; 1 renders in
+                   this process
+        progress: optional callable(n) called with the number of files
+                  written so far; returning False cancels the export
+
+    Returns:
+        The paths written, in order.
+    """
+    if not isinstance(array, np.ndarray):
+        array = np.asarray(array)
+    base = frame_slices(array.shape, slices)
+    state = view_state(array.dtype, view, **options)
+    frame_dims = [d for d, s in enumerate(base) if len(range(array.shape[d])[s]) > 1]
+    if dims is None:
+        dims = [d for d in range(array.ndim) if d not in frame_dims]
+    if any(d in frame_dims for d in dims):
+        raise ValueError(f"Dimensions {frame_dims} are the rows and columns of the frame")
+
+    if wl is None and scaling == 'global':
+        if state.transform is not None:
+            logging.warning("The histogram of the whole array is not that of its spectrum, "
+                            "scaling every frame instead.")
+        else:
+            view_type = 'Magnitude' if state.view_type == 'Complex' else state.view_type
+            wl = tuple(volume_histogram(array, VALUE_TRANSFORMS[view_type]).percentiles((2, 98)))
+
+    os.makedirs(directory, exist_ok=True)
+    jobs = []
+    for index in itertools.product(*(range(array.shape[d]) for d in dims)):
+        frame = list(base)
+        for d, i in zip(dims, index):
+            frame[d] = slice(i, i + 1)
+        name = '_'.join([prefix] + [f'{i:0{len(str(array.shape[d] - 1))}d}'
+                                    for d, i in zip(dims, index)])
+        jobs.append((tuple(frame), os.path.join(directory, f'{name}.{fmt}')))
+    batches = [jobs[i:i + BATCH_SIZE] for i in range(0, len(jobs), BATCH_SIZE)]
+
+    processes = processes or os.cpu_count() or 1
+    written = 0
+    if processes == 1 or len(batches) <= 1:
+        _init_worker(array, state, cmap, wl)
+        try:
+            for batch in batches:
+                written += _export_batch(batch)
+                if progress is not None and progress(written) is False:
+                    break
+        finally:
+            _worker.clear()
+        return [path for _, path in jobs[:written]]
+
+    source = transport.share(array)
+    try:
+        with ProcessPoolExecutor(min(processes, len(batches)), initializer=_init_worker,
+                                 initargs=(source, state, cmap, wl)) as pool:
+            for n in pool.map(_export_batch, batches):
+                written += n
+                if progress is not None and progress(written) is False:
+                    pool.shutdown(cancel_futures=True)
+                    break
+    finally:
+        transport.release_array(source)
+    return [path for _, path in jobs[:written]]
@@ -0,0 +1,289 @@
+"""
+Colormap lookup tables and the renderers that apply them: LutRenderer for
+real frames with window/level, complex2rgb for the Complex view (phase as
+hue, magnitude as brightness). NumPy only, so frames can be rendered without
+Qt (see render).
+
+Both work in reused scratch buffers: once warmed up for a frame shape, the
+only per-frame allocation is complex2rgb's output when none is passed (and
+its temporaries for frames beyond SCRATCH_BYTES, e.g. full resolution
+exports of huge frames).
+"""
+import math
+import threading
+import numpy as np
+
+from .precision import real_dtype
+
+# Colormap name -> 256x4 uint8 RGBA table, built once per process.
+_lut_cache = {}
+
+N_COLORS = 256
+
+# Scratch buffers of complex2rgb, per thread as frames are prepared on workers.
+_scratch = threading.local()
+
+# Largest scratch buffer kept per thread; enough for the (pyramid reduced)
+# frames on screen, without every worker holding on to huge ones.
+SCRATCH_BYTES = 32 << 20
+
+
+def scratch(name, shape, dtype):
+    "Contiguous buffer of this thread, reused for any shape that fits. Contents are undefined."
+    n = math.prod(shape)
+    buf = getattr(_scratch, name, None)
+    if buf is None or buf.dtype != dtype or buf.size < n:
+        buf = np.empty(n, dtype)
+        setattr(_scratch, name, buf if buf.nbytes <= SCRATCH_BYTES else None)
+    return buf[:n].reshape(shape)
+
+
+def get_lut(name):
+    """
+    Returns the cached 256-by-4 uint8 RGBA lookup table of a matplotlib
+    colormap. The table is read-only and shared between viewers.
+    """
+    lut = _lut_cache.get(name)
+    if lut is None:
+        from matplotlib import colormaps
+        lut = colormaps[name](np.linspace(0, 1, N_COLORS), bytes=True)
+        lut = np.ascontiguousarray(lut, dtype=np.uint8)
+        lut.flags.writeable = False
+        _lut_cache[name] = lut
+    return lut
+
+
+class LutRenderer:
+    """
+    Turns frames into uint8 RGBA images with window/level and a colormap LUT.
+    The scratch and output buffers are allocated once per frame shape and
+    reused, so repeated calls (slice steps, window/level drags) do not
+    allocate. The returned array is overwritten by the next call. Frames
+    are processed in strips of rows, so besides the 4 bytes per pixel of
+    output the buffers take at most 1.5 * SCRATCH_BYTES.
+
+    Floating point and wide integer frames are windowed into a float32
+    scratch buffer, with the offset subtracted in the frame's own precision
+    (see precision). Integer and bool frames of up to 16 bits skip that: the
+    color of every possible value is computed once per window/level, and
+    pixels only look up their value.
+    """
+
+    def __init__(self):
+        self.shape = None
+        self.scratch = None  # float32 windowed values
+        self.index = None    # LUT indices, intp so np.take needs no conversion
+        self.rgba32 = None   # one packed RGBA pixel per uint32
+        self.rgb = None      # uint8 output for RGB frames
+        self.table = None    # packed RGBA per integer value, see value_table
+        self.table_key = None
+        self.table_lut = None
+
+    def _buffers(self, shape):
+        if shape != self.shape:
+            self.shape = shape
+            h, w = shape
+            rows = min(h, max(1, SCRATCH_BYTES // (np.dtype(np.intp).itemsize * max(1, w))))
+            self.scratch = np.empty((rows, w), dtype=np.float32)
+            self.index = np.empty((rows, w), dtype=np.intp)
+            self.rgba32 = np.empty(shape, dtype=np.uint32)
+
+    def render(self, frame, vmin, vmax, lut):
+        """
+        Windows a real 2D frame to [vmin, vmax] and maps it through the lut.
+
+        Parameters:
+            frame:          the real image as 2D array
+            vmin, vmax:     the display range
+            lut:            the colormap as 256-by-4 uint8 matrix
+
+        Returns:
+            rgba:           the m-by-n-by-4 uint8 image (a reused buffer)
+        """
+        self._buffers(frame.shape)
+        integers = frame.dtype.kind in 'biu' and frame.dtype.itemsize <= 2
+        if integers:
+            # Bit patterns as indices into the colors of all values.
+            table = self.value_table(frame.dtype, vmin, vmax, lut)
+            frame = frame.view(f'u{frame.dtype.itemsize}')
+        else:
+            table = lut.view(np.uint32).ravel()
+        step = len(self.index)
+        for start in range(0, frame.shape[0], step):
+            part = frame[start:start + step]
+            index = self.index[:len(part)]
+            if integers:
+                np.copyto(index, part)
+            else:
+                scratch = self.window(part, vmin, vmax, out=self.scratch[:len(part)])
+                np.copyto(index, scratch, casting='unsafe')
+            # Gather whole RGBA pixels as uint32, one lookup per pixel.
+            np.take(table, index, out=self.rgba32[start:start + step], mode='clip')
+        return self.rgba32.view(np.uint8).reshape(*self.shape, 4)
+
+    @staticmethod
+    def window(values, vmin, vmax, out):
+        """
+        (values - vmin) * scale, clipped to LUT indices, into the float32 out.
+        The subtraction runs in the precision of values, float64 data with a
+        large offset keeps its detail.
+        """
+        scale = (N_COLORS - 1) / (vmax - vmin) if vmax > vmin else 0.0
+        np.subtract(values, vmin, out=out, dtype=real_dtype(values.dtype), casting='unsafe')
+        np.multiply(out, scale, out=out)
+        np.clip(out, 0, N_COLORS - 1, out=out)
+        return out
+
+    def value_table(self, dtype, vmin, vmax, lut):
+        """
+        Packed RGBA color of every value of an integer (or bool) dtype of up
+        to 16 bits, in the order of their unsigned bit patterns. Rebuilt
+        when the window/level or lut changes, 256 KiB at most.
+        """
+        key = (dtype, float(vmin), float(vmax))
+        if self.table_key != key or self.table_lut is not lut:
+            n_values = 1 << (8 * dtype.itemsize)
+            values = np.arange(n_values, dtype=f'u{dtype.itemsize}').view(dtype)
+            index = self.window(values, vmin, vmax, np.empty(n_values, np.float32))
+            self.table = np.take(lut.view(np.uint32).ravel(), index.astype(np.intp))
+            self.table_key = key
+            self.table_lut = lut
+        return self.table
+
+    def render_rgb(self, frame):
+        """
+        Returns an RGB(A) frame as uint8 with C-contiguous rows, e.g. the
+        output of complex2rgb. Float frames are taken to be in [0, 1].
+        """
+        if frame.dtype == np.uint8 and frame.flags.c_contiguous:
+            return frame
+        if self.rgb is None or self.rgb.shape != frame.shape:
+            self.rgb = np.empty(frame.shape, dtype=np.uint8)
+        if frame.dtype == np.uint8:
+            np.copyto(self.rgb, frame)
+        else:
+            np.multiply(frame, 255, out=self.rgb, casting='unsafe')
+        return self.rgb
+
+
+def martin_phase(N=64):
+    # phase colormap as found in a tool from Martin Uecker (muecker@gwdg.de)
+
+    phase = np.linspace(0, 2 * np.pi, N)
+
+    c = np.zeros((N, 3))
+    c[:, 0] = np.sin(phase)
+    c[:, 1] = np.sin(phase + 120 * np.pi / 180)
+    c[:, 2] = np.sin(phase + 240 * np.pi / 180)
+
+    c = (c + 1) / 2
+
+    return c
+
+# Packed RGBA (one uint32 per entry) phase tables, keyed by N.
+_phase_luts = {}
+
+
+def phase_lut(N=256, incolormap=None):
+    """
+    Returns the phase colormap as N packed uint32 RGBA entries (alpha 255),
+    ready for a single gather. The default colormap is built once per N.
+    """
+    if incolormap is None:
+        lut = _phase_luts.get(N)
+        if lut is not None:
+            return lut
+        cmap = martin_phase(N)
+    else:
+        cmap = np.asarray(incolormap)
+        N = len(cmap)
+
+    rgba = np.full((N, 4), 255, dtype=np.uint8)
+    rgba[:, :3] = np.clip(np.rint(cmap[:, :3] * 255), 0, 255)
+    lut = rgba.view(np.uint32).ravel()
+    if incolormap is None:
+        _phase_luts[N] = lut
+    return lut
+
+
+def complex2rgb(img, N=256, clim=None, incolormap=None, out=None):
+    """
+    Calculates the cdata from img and the colormap. The phase picks the hue
+    from the colormap, the magnitude (scaled to clim) its brightness.
+
+    Parameters:
+        img:            the image as 2D complex data
+        N:              the number of colormap tones as scalar
+        clim:           the magnitude color limits as 2 element vector
+        incolormap:     the colormap as n-by-3 matrix with values in [0, 1]
+        out:            optional m-by-n-by-4 uint8 array to write into
+
+    Returns:
+        rgb:            the uint8 RGBA cdata m-by-n-by-4 matrix (alpha 255)
+        clim:           the colorlimits as 2 element vector
+    """
+    lut = phase_lut(N, incolormap)
+
+    if out is None or out.shape != (*img.shape, 4):
+        out = np.empty((*img.shape, 4), dtype=np.uint8)
+
+    # Huge frames are colored in strips of rows, so that the scratch buffers
+    # (intp indices being the largest) stay within SCRATCH_BYTES.
+    step = max(1, SCRATCH_BYTES // (np.dtype(np.intp).itemsize * max(1, img.shape[1])))
+    strips = [slice(i, i + step) for i in range(0, img.shape[0], step)]
+
+    # get minimum and maximum magnitude value
+    mi, ma = np.inf, -np.inf
+    for rows in strips:
+        m = magnitude(img[rows])
+        mi = min(mi, np.min(m))
+        ma = max(ma, np.max(m))
+
+    # set the colorlimits
+    if clim is None:
+        clim = [mi, ma]
+    # A constant magnitude is shown as a pure phase map.
+    shade = not (round(mi * 1e12) == round(ma * 1e12) and ma != 0)
+
+    for rows in strips:
+        _colorize(img[rows], out[rows], lut, clim if shade else None,
+                  m if len(strips) == 1 else None)
+    return out, clim
+
+
+def magnitude(img):
+    """
+    |img| as float32 in a scratch buffer. float32 is plenty for display, and
+    what complex64 gives natively; complex128 is converted as it is
+    computed, without float64 copies.
+    """
+    return np.abs(img, out=scratch('magnitude', img.shape, np.float32), casting='unsafe')
+
+
+def _colorize(img, out, lut, clim, m=None):
+    "complex2rgb for a block of rows, given the magnitude limits (None for no shading) and maybe |img|."
+    N = len(lut)
+    packed = out.view(np.uint32).reshape(img.shape)
+
+    # Quantize the phase from [-pi, pi] to the nearest colormap index and
+    # gather whole RGBA pixels at once.
+    p = np.arctan2(img.imag, img.real, out=scratch('phase', img.shape, np.float32),
+                   casting='unsafe')
+    p += np.pi
+    p *= (N - 1) / (2 * np.pi)
+    np.rint(p, out=p)
+    index = scratch('index', img.shape, np.intp)
+    np.copyto(index, p, casting='unsafe')
+    np.take(lut, index, out=packed, mode='clip')
+
+    if clim is not None:
+        # Scale magnitude to 0..1 and use it as brightness.
+        if m is None:
+            m = magnitude(img)
+        lo, hi = clim
+        scale = 1.0 / (hi - lo) if hi > lo else 0.0
+        m -= lo
+        m *= scale
+        np.clip(m, 0, 1, out=m)
+        rgb = out[..., :3]
+        np.multiply(rgb, m[..., None], out=rgb, casting='unsafe')
@@ -0,0 +1,245 @@
+import math
+from typing import NamedTuple, Optional, Tuple
+import numpy as np
+
+from .lut import complex2rgb
+from .profiling import span
+from .pyramid import block_mean
+from .projection import project
+from .spectral import read_transformed
+
+# Value transform of each view type, used when scanning whole volumes.
+# Complex view is windowed on the magnitude.
+VALUE_TRANSFORMS = {
+    'Magnitude': np.abs,
+    'Real': np.real,
+    'Imag': np.imag,
+    'Phase': np.angle,
+    'Complex': np.abs,
+}
+
+# Montage tiles are read and reduced this many bytes of source data at a
+# time, see montage_source.
+MONTAGE_BATCH_BYTES = 64 << 20
+
+
+class ViewState(NamedTuple):
+    """
+    Everything that turns a raw slice into a displayable frame. Hashable, so
+    it can be part of a cache key, and safe to hand to worker threads.
+    """
+    view_type: str = 'Magnitude'
+    transpose: bool = False
+    flipv: bool = False
+    fliph: bool = False
+    nrot: int = 0
+    # Magnitude limits, only used by the Complex view.
+    clim: Optional[Tuple[float, float]] = None
+    # Pyramid reduction, see pyramid.block_mean; 1 is full resolution.
+    factor: int = 1
+    # (dimension, columns) to tile the slices along dimension into a
+    # montage with that many columns; None for a single frame.
+    montage: Optional[Tuple[int, int]] = None
+    # (dimension, reducer) collapsing dimension before display, see
+    # projection.project; None to show the selected slice.
+    projection: Optional[Tuple[int, str]] = None
+    # ('FFT' or 'IFFT', axes) applied to the data before anything else, see
+    # spectral.read_transformed; None for the data as is.
+    transform: Optional[Tuple[str, Tuple[int, ...]]] = None
+
+
+def slice_key(slices):
+    "Hashable form of a tuple of slices (slice objects are not hashable before 3.12)."
+    return tuple((s.start, s.stop, s.step) if isinstance(s, slice) else s for s in slices)
+
+
+def montage_grid(n):
+    "(rows, columns) of a roughly square montage of n tiles."
+    ncols = math.ceil(math.sqrt(n))
+    return -(-n // ncols), ncols
+
+
+def frame_shape(shape, slices, state: ViewState):
+    """
+    Shape of the oriented, full resolution frame that prepare_frame makes of
+    read_frame(data, slices, state), the whole montage if state has one.
+    """
+    lengths = [len(range(n)[s]) for n, s in zip(shape, slices)]
+    if state.projection is not None:
+        lengths[state.projection[0]] = 1
+    n_tiles = 1
+    if state.montage is not None:
+        n_tiles = lengths.pop(state.montage[0])
+    dims = tuple(n for n in lengths if n != 1)
+    if len(dims) == 2 and state.transpose != bool(state.nrot % 2):
+        dims = dims[::-1]
+    if state.montage is not None and len(dims) == 2:
+        ncols = state.montage[1]
+        dims = (-(-n_tiles // ncols) * dims[0], ncols * dims[1])
+    return dims
+
+
+def read_frame(data, slices, state: ViewState):
+    """
+    Reads data[slices], Fourier transformed and projected if the state says
+    so, as the squeezed 2D frame, or for a montage as the n-by-h-by-w stack
+    of tiles.
+    """
+    if state.projection is None:
+        cimg = read_transformed(data, slices, state.transform)
+    else:
+        cimg = project(data, slices, *state.projection, transform=state.transform)
+    return arrange(cimg, state)
+
+
+def arrange(cimg, state: ViewState):
+    "Squeezes sliced (or projected) data to the frame or tile stack of read_frame."
+    if state.montage is None:
+        return cimg.squeeze()
+    cimg = np.moveaxis(cimg, state.montage[0], 0)
+    return cimg.reshape(cimg.shape[0], *(n for n in cimg.shape[1:] if n != 1))
+
+
+def tile(stack, ncols, out=None, start=0):
+    """
+    Arranges an n-by-h-by-w stack row by row into one image, with two
+    copies into the final array instead of one per tile. Unused cells at
+    the end of the last row are zero. With out (from a previous call), the
+    stack becomes tiles start to start + n of it.
+    """
+    n, h, w = stack.shape
+    if out is None:
+        out = np.zeros((-(-n // ncols) * h, ncols * w), stack.dtype)
+    # (row, column, y, x) view of the output
+    grid = out.reshape(-1, h, ncols, w).swapaxes(1, 2)
+    # Up to the end of the first row, whole rows, then the rest
+    first = min(n, -start % ncols)
+    row, col = divmod(start, ncols)
+    grid[row, col:col + first] = stack[:first]
+    row += col + first >= ncols
+    full = (n - first) // ncols
+    grid[row:row + full] = stack[first:first + full * ncols].reshape(full, ncols, h, w)
+    rest = n - first - full * ncols
+    if rest:
+        grid[row + full, :rest] = stack[n - rest:]
+    return out
+
+
+def orient(cimg, state: ViewState):
+    "Applies transpose, flips and rotation to the last two axes, as views."
+    if state.transpose:
+        cimg = cimg.swapaxes(-1, -2)
+    if state.flipv:
+        cimg = np.flip(cimg, -2)
+    if state.fliph:
+        cimg = np.flip(cimg, -1)
+    if state.nrot != 0:
+        cimg = np.rot90(cimg, state.nrot, axes=(-2, -1))
+    return cimg
+
+
+def complex_source(cimg, state: ViewState):
+    """
+    Oriented and reduced complex frame that the Complex view colorizes.
+    Averaging happens on the complex values, as for a lower resolution
+    acquisition. Montage tiles are oriented and reduced one by one.
+    """
+    cimg = block_mean(orient(cimg, state), state.factor)
+    if state.montage is not None:
+        cimg = tile(cimg, state.montage[1])
+    return cimg
+
+
+def reduce_frame(cimg, state: ViewState):
+    """
+    The part of prepare_frame before tiling: orientation, the value
+    transform of Magnitude, Real and Imag, and the pyramid reduction. Phase
+    and Complex stay complex, see complex_source.
+    """
+    cimg = orient(cimg, state)
+    if state.view_type == 'Magnitude':
+        cimg = np.abs(cimg)
+    elif state.view_type == 'Real':
+        cimg = np.real(cimg)
+    elif state.view_type == 'Imag':
+        cimg = np.imag(cimg)
+    return block_mean(cimg, state.factor)
+
+
+def finish_frame(cimg, state: ViewState, out=None):
+    "The part of prepare_frame after tiling: phases or colors of Phase and Complex."
+    if state.view_type == 'Phase':
+        return np.angle(cimg)
+    elif state.view_type == 'Complex':
+        with span('complex2rgb'):
+            cimg, _ = complex2rgb(cimg, clim=state.clim, out=out)
+    return cimg
+
+
+def prepare_frame(cimg, state: ViewState, out=None):
+    """
+    Prepares a squeezed 2D slice (or montage tile stack, see read_frame)
+    for display: orientation first (views, so the value transform produces
+    contiguous output and RGB stays HxWx4), then the view type, then the
+    pyramid reduction and tiling. Magnitude, Real and Imag
+    average the displayed values; Phase and Complex average the complex
+    values first, phases cannot be averaged directly. Pure NumPy, may run on
+    any thread.
+
+    Returns:
+        frame:          real 2D frame, or m-by-n-by-4 uint8 RGBA for Complex
+    """
+    cimg = reduce_frame(cimg, state)
+    if state.montage is not None:
+        cimg = tile(cimg, state.montage[1])
+    return finish_frame(cimg, state, out)
+
+
+def tile_reader(data, slices, state: ViewState):
+    """
+    Reads montage tiles of data[slices] for montage_source: returns
+    read(start, stop), the read_frame stack of tiles start to stop, and the
+    number of tiles.
+    """
+    dim = state.montage[0]
+    s = slices[dim]
+    step = s.step or 1
+    tiles = range(s.start or 0, s.stop, step)
+
+    def read(start, stop):
+        batch = list(slices)
+        batch[dim] = slice(tiles[start], tiles[start] + (stop - start) * step, step)
+        return read_frame(data, tuple(batch), state)
+
+    return read, len(tiles)
+
+
+def montage_source(read, n, state: ViewState, batch_bytes=MONTAGE_BATCH_BYTES):
+    """
+    tile(reduce_frame(stack)) of a montage of n tiles, with read(start,
+    stop) returning the stack of tiles start to stop (see tile_reader).
+    Tiles are read and reduced in batches of about batch_bytes of source
+    data, each written into the canvas before the next is read, so the
+    temporaries follow the batch and not the whole montage.
+    """
+    ncols = state.montage[1]
+    # The first tile gives the size of the batches and of the canvas.
+    stack = read(0, 1)
+    step = max(1, batch_bytes // max(1, stack.nbytes))
+    canvas = None
+    start = 0
+    while True:
+        reduced = reduce_frame(stack, state)
+        if canvas is None:
+            h, w = reduced.shape[-2:]
+            canvas = np.zeros((-(-n // ncols) * h, ncols * w), reduced.dtype)
+        tile(reduced, ncols, canvas, start)
+        start += len(stack)
+        if start >= n:
+            return canvas
+        stack = read(start, min(n, start + step))
+
+
+def prepare_montage(read, n, state: ViewState, out=None):
+    "prepare_frame of a montage, read and reduced in batches by montage_source."
+    return finish_frame(montage_source(read, n, state), state, out)
@@ -0,0 +1,38 @@
+"""
+Precision policy of the display pipeline. Frames are computed in the
+narrowest floating point type that holds the data's values exactly, never
+in float64 only because NumPy promotes to it:
+
+- bool, 8 and 16 bit integers, float16 and float32: float32
+- 32 and 64 bit integers and float64: float64
+- complex64 and complex128 keep their type
+
+Integer frames of up to 16 bits are not converted at all for display, they
+index a table of colors per value, see lut.LutRenderer. Reductions that
+cancel badly (projection.project's Std) are the exception, they accumulate
+in float64.
+"""
+import numpy as np
+
+
+def real_dtype(dtype):
+    "Real floating point type values of dtype are computed in (the magnitude type for complex)."
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'c':
+        return np.finfo(dtype).dtype
+    if dtype.kind == 'f':
+        return np.dtype(np.float32) if dtype.itemsize <= 4 else dtype
+    if dtype.kind in 'iub' and dtype.itemsize <= 2:
+        return np.dtype(np.float32)
+    return np.dtype(np.float64)
+
+
+def working_dtype(dtype):
+    "Floating point type to compute with for data of dtype: real_dtype, complex types as they are."
+    dtype = np.dtype(dtype)
+    return dtype if dtype.kind == 'c' else real_dtype(dtype)
+
+
+def complex_dtype(dtype):
+    "Complex type of the same precision, e.g. of a Fourier transform."
+    return np.result_type(real_dtype(dtype), np.complex64)
@@ -0,0 +1,135 @@
+"""
+Timing spans around the stages of showing a frame (slicing, conversion,
+colormapping, drawing, receiving data), to find out which one is slow.
+
+Every span updates running statistics per stage, which the viewer's
+performance HUD shows (View -> Performance HUD). While a trace is being
+written, spans also go to a Chrome trace file that chrome://tracing or
+https://ui.perfetto.dev open. PYARRVIEW_TRACE=path traces the viewer
+process from its start; start_trace/stop_trace do so in this process.
+"""
+import os
+import sys
+import json
+import time
+import threading
+from collections import deque
+
+# Spans per stage the running statistics are taken over
+WINDOW = 60
+
+_lock = threading.Lock()
+_durations = {}
+_trace = None
+
+
+class span:
+    "Times a with block as stage name."
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, self.start, time.perf_counter() - self.start)
+
+
+def record(name, start, duration):
+    "Adds a span that started at start (time.perf_counter) and took duration [s]."
+    with _lock:
+        durations = _durations.get(name)
+        if durations is None:
+            durations = _durations[name] = deque(maxlen=WINDOW)
+        durations.append(duration)
+        if _trace is not None:
+            _trace.add(name, start, duration)
+
+
+def stage_times():
+    "Mean duration [s] of the recent spans of each stage."
+    with _lock:
+        return {name: sum(d) / len(d) for name, d in _durations.items() if d}
+
+
+def reset():
+    with _lock:
+        _durations.clear()
+
+
+def rss_bytes():
+    "Resident memory of this process, or its peak where the current value is not available."
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak << 10
+
+
+class _Trace:
+    """
+    Chrome trace events written as a JSON array as they come. The array is
+    closed by close(), but the viewers also accept it unterminated, so a
+    trace of a process that is killed is still readable up to the last
+    flush (at most a second old).
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'w')
+        self.file.write('[')
+        self.first = True
+        self.pid = os.getpid()
+        self.threads = set()
+        self.closed = threading.Event()
+        threading.Thread(target=self.flush_periodically, name='pyArrView-trace', daemon=True).start()
+
+    def write(self, event):
+        self.file.write(('\n' if self.first else ',\n') + json.dumps(event))
+        self.first = False
+
+    def add(self, name, start, duration):
+        tid = threading.get_ident()
+        if tid not in self.threads:
+            self.threads.add(tid)
+            self.write(dict(name='thread_name', ph='M', pid=self.pid, tid=tid,
+                            args=dict(name=threading.current_thread().name)))
+        self.write(dict(name=name, ph='X', pid=self.pid, tid=tid,
+                        ts=round(start * 1e6, 1), dur=round(duration * 1e6, 1)))
+
+    def flush_periodically(self):
+        while not self.closed.wait(1.0):
+            with _lock:
+                if not self.closed.is_set():
+                    self.file.flush()
+
+    def close(self):
+        self.closed.set()
+        self.file.write('\n]\n')
+        self.file.close()
+
+
+def start_trace(path):
+    "Writes all following spans of this process to a Chrome trace file at path."
+    global _trace
+    stop_trace()
+    with _lock:
+        _trace = _Trace(path)
+
+
+def stop_trace():
+    "Finishes the trace file, if a trace is being written."
+    global _trace
+    with _lock:
+        if _trace is not None:
+            _trace.close()
+            _trace = None
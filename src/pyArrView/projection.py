@@ -0,0 +1,128 @@
+"""
+Projections that collapse one dimension of an N-D array, computed in chunks
+along that dimension so memory stays bounded for memory-mapped data.
+
+Reducers work on the data values: Mean and Sum keep complex values, MIP and
+MinIP pick the sample with the largest/smallest magnitude for complex data
+(and value for real data), Std and RSS give real magnitudes. The projection
+then goes through the normal view pipeline (Magnitude, Phase, ...).
+
+A Fourier transform (see spectral) is applied to each chunk before it is
+reduced, e.g. to combine coils of k-space data in image space. A 1D
+transform along the reduced dimension needs all of it, so then the chunks
+split another dimension.
+
+Sums are accumulated in precision.working_dtype, only Std uses float64.
+"""
+import numpy as np
+
+from .stats import CHUNK_BYTES
+from .spectral import read_transformed, transformed_dtype
+from .precision import real_dtype, working_dtype
+
+REDUCERS = ('MIP', 'MinIP', 'Mean', 'Sum', 'Std', 'RSS')
+
+
+def _pick(best, chunk, axis, largest):
+    "Keeps the sample with the largest or smallest magnitude (value for real data)."
+    if np.iscomplexobj(chunk):
+        mag = np.abs(chunk)
+        i = np.expand_dims(mag.argmax(axis) if largest else mag.argmin(axis), axis)
+        cand = np.take_along_axis(chunk, i, axis)
+        if best is None:
+            return cand
+        better = np.abs(cand) > np.abs(best) if largest else np.abs(cand) < np.abs(best)
+        return np.where(better, cand, best)
+    cand = chunk.max(axis, keepdims=True) if largest else chunk.min(axis, keepdims=True)
+    if best is None:
+        return cand
+    return np.maximum(best, cand) if largest else np.minimum(best, cand)
+
+
+def project(data, slices, axis, reducer, chunk_bytes=CHUNK_BYTES, transform=None):
+    """
+    Reduces data[slices] along axis, reading at most about chunk_bytes at a
+    time. slices[axis] selects the part of the dimension to reduce. The
+    optional transform is applied to every chunk as it is read.
+
+    Returns:
+        proj:           data[slices] with axis reduced to length 1
+    """
+    sel = range(data.shape[axis])[slices[axis]]
+    other = [len(range(m)[s]) for m, s in zip(data.shape, slices)]
+    other[axis] = 1
+    dtype = transformed_dtype(data.dtype, transform)
+    if transform is not None and tuple(transform[1]) == (axis,):
+        return _project_transformed(data, slices, axis, reducer, chunk_bytes, transform, other)
+
+    step = max(1, chunk_bytes // max(1, dtype.itemsize * int(np.prod(other))))
+    chunks = (read_transformed(data, (*slices[:axis], slice(part.start, part.stop, part.step),
+                                      *slices[axis+1:]), transform)
+              for part in (sel[i:i + step] for i in range(0, len(sel), step)))
+    return _reduce(chunks, axis, reducer, len(sel), dtype)
+
+
+def _project_transformed(data, slices, axis, reducer, chunk_bytes, transform, other):
+    """
+    project for a 1D transform along axis itself. Every read transforms the
+    whole axis, so instead of chunks along it the data is split along the
+    longest other dimension, and each part is transformed and reduced once.
+    """
+    n = len(range(data.shape[axis])[slices[axis]])
+    dtype = transformed_dtype(data.dtype, transform)
+    split = max(range(len(other)), key=lambda d: other[d] if d != axis else 0)
+    if split == axis or other[split] == 1:
+        return _reduce([read_transformed(data, slices, transform)], axis, reducer, n, dtype)
+    # Bytes per index along split of the whole transformed axis
+    unit = dtype.itemsize * data.shape[axis] * int(np.prod(other)) // other[split]
+    step = max(1, chunk_bytes // max(1, unit))
+    sel = range(data.shape[split])[slices[split]]
+    parts = []
+    for i in range(0, len(sel), step):
+        part = sel[i:i + step]
+        slcs = (*slices[:split], slice(part.start, part.stop, part.step), *slices[split+1:])
+        parts.append(_reduce([read_transformed(data, slcs, transform)], axis, reducer, n, dtype))
+    return np.concatenate(parts, axis=split)
+
+
+def _reduce(chunks, axis, reducer, n, dtype):
+    "Reduces consecutive chunks of n samples along axis with reducer, see project."
+    acc = working_dtype(dtype)
+    sq_acc = real_dtype(dtype)
+    if reducer == 'Std':
+        # E|x|^2 - |E x|^2 cancels badly in single precision.
+        acc = np.complex128 if np.issubdtype(dtype, np.complexfloating) else np.float64
+        sq_acc = np.float64
+
+    result = None
+    sq = None
+    for chunk in chunks:
+        if reducer in ('MIP', 'MinIP'):
+            result = _pick(result, chunk, axis, reducer == 'MIP')
+            continue
+        if reducer in ('Mean', 'Sum', 'Std'):
+            s = chunk.sum(axis, keepdims=True, dtype=acc)
+            if result is None:
+                result = s
+            else:
+                result += s
+        if reducer in ('Std', 'RSS'):
+            mag2 = np.abs(chunk).astype(sq_acc, copy=False)
+            np.square(mag2, out=mag2)
+            s = mag2.sum(axis, keepdims=True)
+            if sq is None:
+                sq = s
+            else:
+                sq += s
+
+    if reducer == 'Mean':
+        result /= n
+    elif reducer == 'Std':
+        mean = result / n
+        result = np.sqrt(np.maximum(sq / n - np.abs(mean) ** 2, 0))
+    elif reducer == 'RSS':
+        result = np.sqrt(sq)
+    if reducer in ('Std', 'RSS'):
+        # Keep single precision data single precision.
+        result = result.astype(real_dtype(dtype), copy=False)
+    return result
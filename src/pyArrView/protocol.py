@@ -0,0 +1,48 @@
+"""
+Commands sent from av() to the viewer process. Each command is a small
+picklable NamedTuple; the viewer dispatches on its type (see
+ui.WindowManager). Arrays never travel inline unless they are small, see
+transport.share().
+"""
+from typing import Any, NamedTuple
+
+
+class CreateWindow(NamedTuple):
+    """
+    Opens a new viewer window for the array described by source. With grid,
+    the last axis of the array stacks several arrays that are shown side by
+    side in that many columns.
+    """
+    window_id: int
+    source: Any
+    title: str
+    grid: int = None
+
+
+class UpdateData(NamedTuple):
+    """
+    Replaces the data of a window, keeping its view settings. A source of
+    None means the window's shared buffer was rewritten in place.
+    """
+    window_id: int
+    source: Any = None
+
+
+class SetTitle(NamedTuple):
+    window_id: int
+    title: str
+
+
+class SetView(NamedTuple):
+    "Changes display settings; options are keyword arguments of ImageViewer.set_view."
+    window_id: int
+    options: dict
+
+
+class CloseWindow(NamedTuple):
+    window_id: int
+
+
+class Shutdown(NamedTuple):
+    "Closes all windows and quits the viewer process."
+    pass
@@ -0,0 +1,58 @@
+"""
+Reduced-resolution versions of frames that are much larger than the screen.
+A frame is shown at the coarsest power-of-two reduction that still has at
+least one frame pixel per display pixel, so the cost of everything after
+slicing (colormapping, drawing) follows the display size instead of the
+frame size. Reduced frames are cached like full-resolution ones (the factor
+is part of pipeline.ViewState).
+"""
+import math
+import numpy as np
+
+from .precision import working_dtype
+
+
+def pyramid_factor(frame_shape, display_shape):
+    """
+    Largest power of two by which frame_shape can be reduced without
+    dropping below display_shape in either direction; 1 if the frame is not
+    at least twice the display size.
+    """
+    fh, fw = frame_shape[:2]
+    dh, dw = display_shape
+    if dh < 1 or dw < 1:
+        return 1
+    ratio = min(fh / dh, fw / dw)
+    if ratio < 2:
+        return 1
+    return 1 << int(math.log2(ratio))
+
+
+def block_mean(frame, factor):
+    """
+    Averages factor-by-factor blocks over the last two axes, so a stack of
+    frames (montage tiles) is reduced tile by tile. Edge blocks that do not
+    fill a whole block are averaged over the pixels they have, so no rows or
+    columns are lost. Averages are in precision.working_dtype, e.g. float32
+    for int16 and float16 frames.
+    """
+    if factor <= 1:
+        return frame
+    *lead, h, w = frame.shape
+    acc = working_dtype(frame.dtype)
+    nh, nw = h // factor, w // factor
+    # Whole blocks by splitting an axis (a view, also for strided frames)
+    # and summing over it; np.add.reduceat is several times slower.
+    rows = np.empty((*lead, -(-h // factor), w), acc)
+    rows[..., :nh, :] = frame[..., :nh * factor, :].reshape(*lead, nh, factor, w).sum(axis=-2, dtype=acc)
+    if nh < rows.shape[-2]:
+        rows[..., nh, :] = frame[..., nh * factor:, :].sum(axis=-2, dtype=acc)
+    out = np.empty((*lead, rows.shape[-2], -(-w // factor)), acc)
+    out[..., :nw] = rows[..., :nw * factor].reshape(*rows.shape[:-1], nw, factor).sum(axis=-1)
+    if nw < out.shape[-1]:
+        out[..., nw] = rows[..., nw * factor:].sum(axis=-1)
+
+    counts = np.outer(np.diff(np.arange(0, h, factor), append=h),
+                      np.diff(np.arange(0, w, factor), append=w))
+    out /= counts.astype(out.real.dtype)
+    return out
@@ -0,0 +1,58 @@
+"""
+Centered Fourier transforms of the data on screen, e.g. to switch between
+k-space and image space without transforming a copy of the whole array.
+Only the frames being shown are transformed, with scipy.fft on several
+threads (which also keeps twiddle factors of recent sizes cached):
+
+- over the row and column dimensions (2D), frame by frame
+- along one dimension (1D), which is then read whole, for the frames on
+  screen only
+
+A transform is (kind, axes) with kind 'FFT' or 'IFFT' and the data axes it
+runs over, see pipeline.ViewState. Transforms are unitary (norm='ortho') and
+centered: the zero frequency is in the middle of the axis.
+"""
+import numpy as np
+
+from .precision import working_dtype, complex_dtype
+
+TRANSFORMS = ('FFT', 'IFFT')
+
+# Threads per transform; -1 is all cores.
+WORKERS = -1
+
+
+def centered_fft(x, axes, inverse=False, workers=WORKERS):
+    """
+    ifftshift, (i)fftn and fftshift over axes. Single precision stays single,
+    as do integers of up to 16 bits (see precision).
+    """
+    from scipy import fft
+    x = fft.ifftshift(x.astype(working_dtype(x.dtype), copy=False), axes=axes)
+    x = (fft.ifftn if inverse else fft.fftn)(x, axes=axes, norm='ortho', workers=workers)
+    return fft.fftshift(x, axes=axes)
+
+
+def transformed_dtype(dtype, transform):
+    "dtype of read_transformed for data of dtype."
+    if transform is None:
+        return np.dtype(dtype)
+    return complex_dtype(dtype)
+
+
+def read_transformed(data, slices, transform=None, workers=WORKERS):
+    """
+    data[slices] with the transform applied, all dimensions kept. For a 1D
+    transform the whole axis is read and transformed, and slices[axis] picks
+    from the result.
+    """
+    if transform is None:
+        return np.asarray(data[slices])
+    kind, axes = transform
+    inverse = kind == 'IFFT'
+    if len(axes) > 1:
+        return centered_fft(np.asarray(data[slices]), axes, inverse, workers)
+    axis, = axes
+    full = (*slices[:axis], slice(None), *slices[axis+1:])
+    block = centered_fft(np.asarray(data[full]), axes, inverse, workers)
+    return block[(slice(None),) * axis + (slices[axis],)]
@@ -0,0 +1,225 @@
+import os
+import numpy as np
+
+# Default number of histogram bins; percentiles are exact to (max - min) / BINS.
+BINS = 4096
+
+# Chunk size used when scanning whole volumes.
+CHUNK_BYTES = 64 << 20
+
+
+class Histogram:
+    """
+    Fixed-range histogram that can be accumulated chunk by chunk and answers
+    any number of percentile queries from one pass over the data. Values are
+    interpolated within a bin, so the error of a percentile is bounded by
+    the bin width, (hi - lo) / bins.
+    """
+
+    def __init__(self, lo, hi, bins=BINS):
+        self.lo = float(lo)
+        self.hi = float(hi)
+        self.bins = bins
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.scale = bins / (self.hi - self.lo) if self.hi > self.lo else 0.0
+
+    @property
+    def bin_width(self):
+        return (self.hi - self.lo) / self.bins
+
+    def add(self, values):
+        "Accumulates the finite values of an array of any shape."
+        idx = np.subtract(np.asarray(values), self.lo, dtype=np.float32).ravel()
+        idx *= self.scale
+        # NaNs are dropped here; clip keeps max (and rounding) in the last bin.
+        finite = np.isfinite(idx)
+        if not finite.all():
+            idx = idx[finite]
+        np.clip(idx, 0, self.bins - 1, out=idx)
+        self.counts += np.bincount(idx.astype(np.intp), minlength=self.bins)
+
+    def percentiles(self, qs):
+        """
+        Returns the values below which qs percent of the samples fall, in the
+        same order as qs.
+        """
+        cdf = np.cumsum(self.counts)
+        total = cdf[-1]
+        if total == 0 or self.scale == 0:
+            return [self.lo for _ in qs]
+        out = []
+        for q in qs:
+            target = q / 100 * total
+            i = int(np.searchsorted(cdf, target))
+            i = min(i, self.bins - 1)
+            below = cdf[i - 1] if i > 0 else 0
+            frac = (target - below) / self.counts[i] if self.counts[i] else 0.0
+            out.append(self.lo + (i + frac) * self.bin_width)
+        return out
+
+
+def frame_percentiles(img, qs, lo=None, hi=None, bins=BINS):
+    """
+    Percentiles of a single frame with one histogram pass instead of one
+    sort/partition per percentile. lo/hi can be passed if already known.
+    """
+    if lo is None:
+        lo = np.nanmin(img)
+    if hi is None:
+        hi = np.nanmax(img)
+    hist = Histogram(lo, hi, bins)
+    hist.add(img)
+    return hist.percentiles(qs)
+
+
+def iter_chunks(data, chunk_bytes=CHUNK_BYTES):
+    "Yields consecutive blocks along the first axis of roughly chunk_bytes each."
+    if data.ndim == 0 or data.shape[0] == 0:
+        yield np.asarray(data[()])
+        return
+    row_bytes = max(1, data.dtype.itemsize * int(np.prod(data.shape[1:])))
+    step = max(1, chunk_bytes // row_bytes)
+    for start in range(0, data.shape[0], step):
+        yield np.asarray(data[start:start + step])
+
+
+def volume_histogram(data, transform=None, bins=BINS):
+    """
+    Builds the histogram of a whole N-D array in two chunked passes (range,
+    then counts) with bounded memory, suitable for memory-mapped data.
+
+    Parameters:
+        data:           N-D array (or array-like supporting slicing)
+        transform:      optional function applied to every chunk, e.g. np.abs
+
+    Returns:
+        hist:           Histogram with lo/hi set to the data range
+    """
+    def chunks():
+        for c in iter_chunks(data):
+            yield transform(c) if transform is not None else c
+
+    lo, hi = np.inf, -np.inf
+    for c in chunks():
+        if c.size:
+            lo = min(lo, np.nanmin(c))
+            hi = max(hi, np.nanmax(c))
+    hist = Histogram(lo if np.isfinite(lo) else 0, hi if np.isfinite(hi) else 0, bins)
+    for c in chunks():
+        hist.add(c)
+    return hist
+
+
+# Percentiles kept per frame by StatsIndex; others are interpolated.
+SKETCH_PERCENTILES = (1, 2, 5, 10, 25, 50, 75, 90, 95, 98, 99)
+
+
+class StatsIndex:
+    """
+    Per-frame statistics of an N-D array for frames spanned by two display
+    dimensions: min, max, mean and a percentile sketch of every frame, as
+    arrays indexed by the remaining dimensions. Built chunk by chunk; chunks
+    write disjoint parts of the arrays, so they can run on several threads.
+    Afterwards statistics of any frame, or of the whole array, are looked up
+    without touching the pixels.
+    """
+
+    def __init__(self, shape, rows, cols, transform=None):
+        self.shape = shape
+        self.display_dims = (rows, cols)
+        self.other_dims = tuple(d for d in range(len(shape)) if d not in (rows, cols))
+        self.transform = transform
+        index_shape = tuple(shape[d] for d in self.other_dims)
+        self.min = np.full(index_shape, np.nan)
+        self.max = np.full(index_shape, np.nan)
+        self.mean = np.full(index_shape, np.nan)
+        self.sketch = np.full(index_shape + (len(SKETCH_PERCENTILES),), np.nan)
+        self._global_cdf = None
+
+    def chunks(self, itemsize, chunk_bytes=CHUNK_BYTES, min_chunks=os.cpu_count() or 1):
+        """
+        Splits the frames into blocks of at most about chunk_bytes, runs of
+        consecutive frames along the longest remaining dimension, and into
+        at least min_chunks blocks if there are enough frames. Returns data
+        slice tuples to pass to add().
+        """
+        if not self.other_dims:
+            return [tuple(slice(0, n) for n in self.shape)]
+        frame_bytes = itemsize * self.shape[self.display_dims[0]] * self.shape[self.display_dims[1]]
+        n_frames = int(np.prod([self.shape[d] for d in self.other_dims]))
+        step = max(1, min(chunk_bytes // max(1, frame_bytes), n_frames // min_chunks))
+        batch = max(self.other_dims, key=lambda d: self.shape[d])
+        fixed = [d for d in self.other_dims if d != batch]
+        out = []
+        for idx in np.ndindex(*(self.shape[d] for d in fixed)):
+            for start in range(0, self.shape[batch], step):
+                slices = [slice(0, n) for n in self.shape]
+                for d, i in zip(fixed, idx):
+                    slices[d] = slice(i, i + 1)
+                slices[batch] = slice(start, min(start + step, self.shape[batch]))
+                out.append(tuple(slices))
+        return out
+
+    def add(self, data, slices):
+        "Computes the statistics of the frames in data[slices]. Safe to run on worker threads."
+        raw = np.asarray(data[slices])
+        block = raw if self.transform is None else self.transform(raw)
+        block = np.moveaxis(block, self.display_dims, (-2, -1))
+        frames = block.reshape(-1, block.shape[-2] * block.shape[-1])
+        target = tuple(slices[d] for d in self.other_dims)
+        shape = self.min[target].shape
+        self.min[target] = np.nanmin(frames, axis=1).reshape(shape)
+        self.max[target] = np.nanmax(frames, axis=1).reshape(shape)
+        self.mean[target] = np.mean(frames, axis=1, dtype=np.float64).reshape(shape)
+        # Sorting every frame once (vectorized, SIMD for most types) and
+        # interpolating is several times faster than np.percentile.
+        # The order of pixels in a frame does not matter, so they are sorted
+        # in place in C order (sorting a strided view is much slower), in
+        # a copy only if frames is still the data itself.
+        ordered = np.ascontiguousarray(frames)
+        if np.may_share_memory(ordered, raw):
+            ordered = ordered.copy()
+        ordered.sort(axis=1)
+        pos = np.asarray(SKETCH_PERCENTILES) / 100 * (ordered.shape[1] - 1)
+        lo = np.floor(pos).astype(np.intp)
+        hi = np.minimum(lo + 1, ordered.shape[1] - 1)
+        frac = pos - lo
+        sketch = ordered[:, lo] * (1 - frac) + ordered[:, hi] * frac
+        self.sketch[target] = sketch.reshape(shape + (len(SKETCH_PERCENTILES),))
+        self._global_cdf = None
+
+    def frame_index(self, slices):
+        "Index into the statistics arrays of the frame selected by slices."
+        return tuple(slices[d].start for d in self.other_dims)
+
+    def frame_percentiles(self, index, qs):
+        "Percentiles of one frame, interpolated from its sketch."
+        levels = (0, *SKETCH_PERCENTILES, 100)
+        values = (self.min[index], *self.sketch[index], self.max[index])
+        return [float(v) for v in np.interp(qs, levels, values)]
+
+    def global_range(self):
+        return float(np.nanmin(self.min)), float(np.nanmax(self.max))
+
+    def global_percentiles(self, qs, bins=BINS):
+        """
+        Percentiles of the whole array. Every frame has the same number of
+        pixels, so the array's distribution is the average of the frames'
+        (piecewise linear) distributions from their sketches.
+        """
+        if self._global_cdf is None:
+            lo, hi = self.global_range()
+            grid = np.linspace(lo, hi, bins)
+            levels = (0, *SKETCH_PERCENTILES, 100)
+            values = np.concatenate([self.min.reshape(-1, 1),
+                                     self.sketch.reshape(-1, len(SKETCH_PERCENTILES)),
+                                     self.max.reshape(-1, 1)], axis=1)
+            cdf = np.zeros(bins)
+            count = 0
+            for v in values:
+                if np.isfinite(v).all():
+                    cdf += np.interp(grid, v, levels)
+                    count += 1
+            self._global_cdf = grid, cdf / max(count, 1)
+        grid, cdf = self._global_cdf
+        return [float(v) for v in np.interp(qs, cdf, grid)]
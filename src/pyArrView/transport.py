@@ -0,0 +1,358 @@
+import os
+import mmap
+import logging
+import tempfile
+import numpy as np
+import numpy.typing as npt
+
+# Arrays smaller than this are cheaper to pickle than to place in a mapped file.
+MIN_SHARED_BYTES = 1 << 20
+
+# Files created by this process, removed at exit if the viewer did not get to them.
+_owned_paths = set()
+
+
+def _shared_dirs():
+    "Candidate directories for the backing files, RAM-backed ones first."
+    dirs = []
+    if os.path.isdir('/dev/shm'):
+        dirs.append('/dev/shm')
+    dirs.append(tempfile.gettempdir())
+    return dirs
+
+
+def _reserve(path, nbytes):
+    """
+    Grows the file to nbytes. Where possible the space is actually allocated so
+    that a full tmpfs fails here instead of with SIGBUS while copying.
+    """
+    fd = os.open(path, os.O_RDWR)
+    try:
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(fd, 0, nbytes)
+        else:
+            os.ftruncate(fd, nbytes)
+    finally:
+        os.close(fd)
+
+
+def _byte_extent(shape, strides, itemsize):
+    "Returns the (low, high) byte offsets touched by an array relative to its first element."
+    lo = sum(st * (n - 1) for n, st in zip(shape, strides) if st < 0)
+    hi = sum(st * (n - 1) for n, st in zip(shape, strides) if st > 0) + itemsize
+    return lo, hi
+
+
+class SharedArray:
+    """
+    Picklable description of an array living in a memory-mapped file. Only this
+    small object crosses the process boundary; the viewer maps the same pages.
+    """
+
+    def __init__(self, path, shape, dtype, strides, offset=0, owned=True):
+        self.path = path
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.strides = tuple(strides)
+        self.offset = offset
+        self.owned = owned
+
+    def __repr__(self):
+        return f"SharedArray({self.path!r}, shape={self.shape}, dtype={self.dtype})"
+
+    def open(self, writable=False) -> np.ndarray:
+        "Maps the file (read-only unless writable) and wraps it without copying."
+        lo, hi = _byte_extent(self.shape, self.strides, self.dtype.itemsize)
+        buf = np.memmap(self.path, dtype=np.uint8, mode='r+' if writable else 'r',
+                        offset=self.offset + lo, shape=(hi - lo,))
+        return np.ndarray(self.shape, dtype=self.dtype, buffer=buf,
+                          offset=-lo, strides=self.strides)
+
+    def unlink(self):
+        """
+        Removes the backing file if we created it. Existing mappings stay valid,
+        the pages are freed when the last one is dropped.
+        """
+        if not self.owned:
+            return
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # Windows refuses to remove mapped files, leave it to the atexit sweep.
+            logging.debug(f"Could not remove {self.path}: {e}")
+        _owned_paths.discard(self.path)
+
+
+def _find_memmap(array):
+    "Returns the np.memmap an array is a view of, or None."
+    base = array
+    while base is not None:
+        if isinstance(base, np.memmap) and base._mmap is not None:
+            return base
+        base = getattr(base, 'base', None)
+    return None
+
+
+def describe_memmap(array: np.ndarray):
+    """
+    Describes a view of a file-backed np.memmap by its file, byte offset and
+    strides so the viewer can map the same file instead of receiving a copy.
+    Returns None if the array is not backed by a shareable mapping.
+    """
+    mm = _find_memmap(array)
+    # Copy-on-write maps may hold changes the file does not have.
+    if mm is None or mm.filename is None or mm.mode == 'c':
+        return None
+    map_start = np.frombuffer(mm._mmap, dtype=np.uint8).ctypes.data
+    file_start = mm.offset - mm.offset % mmap.ALLOCATIONGRANULARITY
+    offset = file_start + (array.ctypes.data - map_start)
+    return SharedArray(mm.filename, array.shape, array.dtype, array.strides,
+                       offset=offset, owned=False)
+
+
+def _map_new_file(shape, dtype, order='C'):
+    """
+    Creates a backing file for an array, reserves its space and maps it
+    writable. Returns (path, memmap), or None if no directory can hold it.
+    """
+    nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    for d in _shared_dirs():
+        try:
+            fd, path = tempfile.mkstemp(prefix='pyArrView-', suffix='.bin', dir=d)
+            os.close(fd)
+        except OSError:
+            continue
+        try:
+            _reserve(path, nbytes)
+            mm = np.memmap(path, dtype=dtype, mode='r+', shape=shape, order=order)
+        except OSError as e:
+            logging.debug(f"Cannot use {d} for shared arrays: {e}")
+            os.unlink(path)
+            continue
+        _owned_paths.add(path)
+        return path, mm
+    return None
+
+
+def share_array(array: npt.ArrayLike):
+    """
+    Copies the array once into a memory-mapped file and returns its
+    SharedArray description. C- and F-ordered inputs keep their layout,
+    anything else is written in C order. Falls back to returning the array
+    itself (to be pickled) for small, empty or object arrays, or if no
+    backing file could be created.
+    """
+    array = np.asarray(array)
+    if array.dtype.hasobject or array.nbytes < MIN_SHARED_BYTES:
+        return array
+
+    order = 'F' if (array.flags.f_contiguous and not array.flags.c_contiguous) else 'C'
+    mapped = _map_new_file(array.shape, array.dtype, order)
+    if mapped is None:
+        logging.warning("Could not create a shared buffer, sending a copy of the array.")
+        return array
+    path, mm = mapped
+    mm[...] = array
+    strides = mm.strides
+    del mm
+    return SharedArray(path, array.shape, array.dtype, strides)
+
+
+def share_stack(arrays):
+    """
+    Copies equally shaped arrays into one memory-mapped file, one after the
+    other, and returns the SharedArray of them stacked along a new last axis.
+    That is a strided view, so every array keeps its own contiguous pages.
+    Like share_array, small stacks are returned as an array to be pickled.
+    """
+    arrays = [np.asarray(a) for a in arrays]
+    shape = arrays[0].shape
+    if any(a.shape != shape for a in arrays):
+        raise ValueError(f"Arrays shown together need the same shape, got {[a.shape for a in arrays]}")
+    dtype = np.result_type(*arrays)
+    nbytes = len(arrays) * int(np.prod(shape)) * dtype.itemsize
+    mapped = None
+    if not dtype.hasobject and nbytes >= MIN_SHARED_BYTES:
+        mapped = _map_new_file((len(arrays), *shape), dtype)
+        if mapped is None:
+            logging.warning("Could not create a shared buffer, sending a copy of the arrays.")
+    if mapped is None:
+        return np.stack(arrays, axis=-1)
+    path, mm = mapped
+    for i, a in enumerate(arrays):
+        mm[i] = a
+    strides = mm.strides
+    del mm
+    return SharedArray(path, (*shape, len(arrays)), dtype, (*strides[1:], strides[0]))
+
+
+HDF5_SIGNATURE = b'\x89HDF\r\n\x1a\n'
+
+
+def _is_hdf5(path):
+    "HDF5 files (and v7.3 .mat files, which carry a 512 byte header) start with this signature."
+    with open(path, 'rb') as f:
+        head = f.read(512 + len(HDF5_SIGNATURE))
+    return head.startswith(HDF5_SIGNATURE) or head[512:] == HDF5_SIGNATURE
+
+
+def _pick_variable(candidates, key, path):
+    "Picks the variable named key, otherwise the largest one."
+    if key is not None:
+        if key not in candidates:
+            raise KeyError(f"'{key}' not found in {path}. Available: {', '.join(candidates)}")
+        return key
+    if not candidates:
+        raise ValueError(f"No arrays found in {path}")
+    return max(candidates, key=lambda k: int(np.prod(candidates[k])))
+
+
+class _ComplexDataset:
+    """
+    Lazy view of an HDF5 dataset stored as MATLAB-style (real, imag) compound;
+    converts only the requested slices.
+    """
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.shape = dataset.shape
+        self.ndim = dataset.ndim
+        self.dtype = np.result_type(dataset.dtype['real'], np.complex64)
+
+    @property
+    def nbytes(self):
+        "Size once converted, like ndarray.nbytes."
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def __getitem__(self, idx):
+        block = self.dataset[idx]
+        out = np.empty(block.shape, dtype=self.dtype)
+        out.real = block['real']
+        out.imag = block['imag']
+        return out
+
+
+def _complex_view(array):
+    "Reinterprets a (real, imag) compound array as complex without copying."
+    if array.dtype.names != ('real', 'imag'):
+        return array
+    real = array.dtype['real']
+    if (real.kind != 'f' or array.dtype['imag'] != real
+            or array.dtype.fields['imag'][1] != real.itemsize):
+        return array
+    return array.view(np.result_type(real, np.complex64))
+
+
+def _open_hdf5(path, key):
+    """
+    Opens a dataset in an HDF5 (or v7.3 .mat) file. Contiguous, uncompressed
+    datasets are memory-mapped directly, the rest are read slice by slice.
+    """
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError(f"h5py is required to open {path}")
+
+    f = h5py.File(path, 'r')
+    datasets = {}
+    f.visititems(lambda name, obj: datasets.__setitem__(name, obj.shape)
+                 if isinstance(obj, h5py.Dataset) and obj.ndim > 0 else None)
+    dset = f[_pick_variable(datasets, key, path)]
+
+    offset = dset.id.get_offset()
+    if dset.chunks is None and dset.compression is None and offset is not None:
+        array = np.memmap(path, dtype=dset.dtype, mode='r', offset=offset, shape=dset.shape)
+        f.close()
+        return _complex_view(array)
+
+    logging.info(f"{path}:{dset.name} is chunked or compressed, reading slices on demand.")
+    if dset.dtype.names == ('real', 'imag'):
+        return _ComplexDataset(dset)
+    return dset
+
+
+def _open_mat(path, key):
+    "Loads a v5 .mat file. These cannot be mapped, so the variable is read once in the viewer."
+    import scipy.io as spio
+    names = {name: shape for name, shape, _ in spio.whosmat(path)}
+    name = _pick_variable(names, key, path)
+    logging.info(f"Loading '{name}' from {path}")
+    return spio.loadmat(path, variable_names=[name])[name]
+
+
+class FileArray:
+    """
+    Picklable reference to an array stored in a .npy, .mat or .h5 file. The
+    viewer opens it lazily and memory-mapped where the format allows it.
+    """
+
+    def __init__(self, path, key=None):
+        self.path = os.path.abspath(os.fspath(path))
+        self.key = key
+
+    def __repr__(self):
+        return f"FileArray({self.path!r}, key={self.key!r})"
+
+    def open(self):
+        ext = os.path.splitext(self.path)[1].lower()
+        if ext == '.npy':
+            return np.load(self.path, mmap_mode='r')
+        if _is_hdf5(self.path):
+            return _open_hdf5(self.path, self.key)
+        if ext == '.mat':
+            return _open_mat(self.path, self.key)
+        raise ValueError(f"Unsupported file type: {self.path}")
+
+
+def share(obj, key=None):
+    """
+    Prepares anything av() accepts for the trip to the viewer process: file
+    paths and memory-mapped arrays are passed by reference, other arrays are
+    copied into a shared buffer by share_array.
+    """
+    if isinstance(obj, (str, os.PathLike)):
+        source = FileArray(obj, key)
+        if not os.path.isfile(source.path):
+            raise FileNotFoundError(source.path)
+        return source
+
+    if isinstance(obj, np.ndarray):
+        source = describe_memmap(obj)
+        if source is not None:
+            return source
+    return share_array(obj)
+
+
+def open_array(source):
+    "Returns the array for whatever share() produced."
+    if isinstance(source, (SharedArray, FileArray)):
+        return source.open()
+    return source
+
+
+def hand_over(source):
+    """
+    Leaves removing the file of source to the viewer, which does so when its
+    window closes, instead of to this process's exit. For the daemon, whose
+    windows may outlive us.
+    """
+    if isinstance(source, SharedArray):
+        _owned_paths.discard(source.path)
+
+
+def release_array(source):
+    "Frees the resources of a source once its window is gone."
+    if isinstance(source, SharedArray):
+        source.unlink()
+
+
+def cleanup():
+    "Removes backing files created by this process that are still around."
+    for path in list(_owned_paths):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+    _owned_paths.clear()
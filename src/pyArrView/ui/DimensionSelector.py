@@ -12,7 +12,7 @@ class DimensionSelector(QWidget):
         # Initialize instance variables (not class variables!)
         self.dim_buttons = []
         self.button_group = QButtonGroup()
-        self.selected_dimensions = []  # 0: row, 1: column, 2: dynamic
+        self.selected_dimensions = []  # 0: row, 1: column, 2: dynamic, 3: reduction
         self.dim_spinboxes = []
         self.current_indices = []
         self.layout = QHBoxLayout()
@@ -23,11 +23,11 @@ class DimensionSelector(QWidget):
         self.setLayout(self.layout)
 
         if self.ndims == 1:
-            self.selected_dimensions = [0, 0, 0]
+            self.selected_dimensions = [0, 0, 0, -1]
         elif self.ndims == 2:
-            self.selected_dimensions = [0, 1, 0]
+            self.selected_dimensions = [0, 1, 0, -1]
         else:
-            self.selected_dimensions = [0, 1, 2]
+            self.selected_dimensions = [0, 1, 2, -1]
 
 
         for dim_i in range(self.ndims):
@@ -57,6 +57,10 @@ class DimensionSelector(QWidget):
     def update_idx_selection(self, value, dim_i, emit=True):
         '''Updates the selected indices for each dimension. Checks if the value is :, if so, changes the row or column dimension'''
 
+        if value != -1 and dim_i == self.selected_dimensions[3]:
+            # Picking an index in the reduced dimension ends the projection.
+            self.selected_dimensions[3] = -1
+            self.button_group.button(dim_i).set_role(2 if dim_i == self.dynamic_dimension() else -1)
         if value != -1:
             self.current_indices[dim_i] = slice(value, value+1)
         else:
@@ -79,10 +83,21 @@ class DimensionSelector(QWidget):
 
         dim_i = source.dim_id
         role = source.role
-        if role != -1:
+        if role == 3:
+            self.set_reduction_dimension(dim_i)
+        elif role != -1:
+            if dim_i == self.selected_dimensions[3]:
+                self.selected_dimensions[3] = -1
+                if role == 2:
+                    with QSignalBlocker(self.dim_spinboxes[dim_i]):
+                        self.dim_spinboxes[dim_i].setValue(0)
+                    self.update_idx_selection(0, dim_i, False)
             prev_btn_id = self.selected_dimensions[role] 
             self.selected_dimensions[role] = source.dim_id
-            if prev_btn_id != dim_i:
+            if prev_btn_id == self.selected_dimensions[3]:
+                # Stays reduced, only loses the dynamic role.
+                self.button_group.button(prev_btn_id).set_role(3)
+            elif prev_btn_id != dim_i:
                 self.button_group.button(prev_btn_id).set_role(-1)
                 # Need to do the signal block trick to avoid asking plot to update before we are done with it.
                 with QSignalBlocker(self.dim_spinboxes[prev_btn_id]):
@@ -95,9 +110,41 @@ class DimensionSelector(QWidget):
 
             self.indicesUpdatedSignal.emit()
 
+    def set_reduction_dimension(self, dim_i):
+        '''Makes dim_i the dimension collapsed by the projection, or ends the projection if it already is.
+        Row and column dimensions cannot be reduced.'''
+        btn = self.button_group.button(dim_i)
+        if dim_i in self.selected_dimensions[:2]:
+            btn.set_role(self.selected_dimensions.index(dim_i))
+            return
+        prev = self.selected_dimensions[3]
+        self.selected_dimensions[3] = -1
+        if prev != -1:
+            self.button_group.button(prev).set_role(2 if prev == self.dynamic_dimension() else -1)
+            with QSignalBlocker(self.dim_spinboxes[prev]):
+                self.dim_spinboxes[prev].setValue(0)
+            self.update_idx_selection(0, prev, False)
+        if prev != dim_i:
+            self.selected_dimensions[3] = dim_i
+            with QSignalBlocker(self.dim_spinboxes[dim_i]):
+                self.dim_spinboxes[dim_i].setValue(-1)
+            self.update_idx_selection(-1, dim_i, False)
+        self.indicesUpdatedSignal.emit()
+
+    def hide_dimension(self, dim_i):
+        '''Takes dim_i out of the controls; it is always selected whole and gets no role.'''
+        self.current_indices[dim_i] = slice(0, self.shape[dim_i])
+        self.dim_spinboxes[dim_i].hide()
+        self.button_group.button(dim_i).hide()
+
     def dynamic_dimension(self):
         return self.selected_dimensions[2]
 
+    def reduction_dimension(self):
+        '''Dimension collapsed by the projection, or None.'''
+        dim_i = self.selected_dimensions[3]
+        return None if dim_i == -1 else dim_i
+
     def get_current_slices(self):
         return tuple(self.current_indices)
 
@@ -119,11 +166,16 @@ class DimButton(QPushButton):
             self.setStyleSheet('background-color: green; color: white')
         elif role == 2:
             self.setStyleSheet('background-color: blue; color: white')
+        elif role == 3:
+            self.setStyleSheet('background-color: orange; color: black')
         else:
             self.setStyleSheet('background-color: white; color: black')
 
     def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
+        if event.modifiers() & Qt.ControlModifier:
+            # Ctrl+click toggles the reduction (projection) role.
+            self.set_role(3)
+        elif event.button() == Qt.LeftButton:
             self.set_role(0)
         elif event.button() == Qt.RightButton:
             self.set_role(1)
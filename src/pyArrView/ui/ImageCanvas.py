@@ -0,0 +1,52 @@
+import numpy as np
+from PySide6 import QtWidgets as QTW
+from PySide6.QtCore import Qt, QRectF
+from PySide6.QtGui import QImage, QPainter
+
+from ..profiling import span
+
+
+class ImageCanvas(QTW.QWidget):
+    """
+    Native display canvas. Paints an already colormapped uint8 RGB(A) frame
+    with QPainter, keeping its aspect ratio. The QImage wraps the NumPy buffer
+    without copying, so the buffer is kept alive here until the next frame.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.qimage = None
+        self.buffer = None
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setSizePolicy(QTW.QSizePolicy.Expanding,
+                           QTW.QSizePolicy.Expanding)
+
+    def set_frame(self, rgb: np.ndarray):
+        "Displays an (H, W, 3) or (H, W, 4) uint8 array with C-contiguous rows."
+        h, w, c = rgb.shape
+        fmt = QImage.Format_RGBA8888 if c == 4 else QImage.Format_RGB888
+        if self.buffer is not rgb or self.qimage is None \
+                or self.qimage.format() != fmt or self.qimage.size().toTuple() != (w, h):
+            self.buffer = rgb
+            self.qimage = QImage(rgb.data, w, h, rgb.strides[0], fmt)
+        self.update()
+
+    def target_rect(self):
+        "Largest rectangle with the image's aspect ratio, centred in the widget."
+        iw, ih = self.qimage.width(), self.qimage.height()
+        scale = min(self.width() / iw, self.height() / ih)
+        w, h = iw * scale, ih * scale
+        return QRectF((self.width() - w) / 2, (self.height() - h) / 2, w, h)
+
+    def paintEvent(self, event):
+        with span('paint'):
+            painter = QPainter(self)
+            painter.fillRect(self.rect(), Qt.white)
+            if self.qimage is not None:
+                target = self.target_rect()
+                # Nearest neighbour when magnifying, smooth when shrinking.
+                painter.setRenderHint(QPainter.SmoothPixmapTransform,
+                                      target.width() < self.qimage.width())
+                painter.drawImage(target, self.qimage)
+            painter.end()
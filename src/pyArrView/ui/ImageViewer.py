@@ -1,31 +1,64 @@
+import os
+import time
+import shutil
 import logging
+import threading
+from collections import deque
 from typing import Literal
 import numpy as np
-import scipy.io as spio
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('QtAgg')
 
 from PySide6 import QtCore, QtWidgets as QTW
 
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
-# from matplotlib.backends.backend_qt5 import NavigationToolbar2QT as NavigationToolbar
-from matplotlib.figure import Figure
-from matplotlib import animation
 import numpy.typing as npt
 from .DimensionSelector import DimensionSelector
 from PySide6.QtCore import Slot
 from PySide6.QtWidgets import QMainWindow
 from PySide6.QtGui import QIcon
-from .utils import complex2rgb
+from ..lut import get_lut, LutRenderer
+from ..stats import frame_percentiles, volume_histogram, StatsIndex
+from ..pipeline import (VALUE_TRANSFORMS, ViewState, prepare_frame, slice_key, frame_shape,
+                        complex_source, read_frame, arrange, montage_grid, tile_reader,
+                        montage_source, prepare_montage, finish_frame)
+from ..projection import REDUCERS, project
+from ..spectral import read_transformed
+from ..pyramid import pyramid_factor
+from ..cache import FrameCache
+from ..export import write_movie, movie_backend, ExportCancelled
+from .. import profiling
+from ..profiling import span
+from . import workers
+from .ImageCanvas import ImageCanvas
 from importlib.resources import files
 
+
+def pyplot():
+    """
+    pyplot is only needed for Plot Frame and takes about as long to import as
+    the rest of the viewer, so it is imported on first use (as is scipy.io
+    for saving .mat files).
+    """
+    import matplotlib
+    matplotlib.use('QtAgg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def preload_backend(backend):
+    "Imports what the display backend needs before the first window does."
+    if backend == 'matplotlib':
+        import matplotlib.backends.backend_qtagg
+        import matplotlib.figure
+    get_lut('gray')
+
 class ImageViewer(QTW.QWidget):
 
     timer_interval = 100 # [ms]
     dim_selector = None
     view_type: Literal['Magnitude', 'Real', 'Imag', 'Phase', 'Complex'] = 'Magnitude'
     cmap = 'gray'
+    # 'matplotlib' draws through FigureCanvasQTAgg, 'qimage' colormaps in
+    # NumPy and paints with QPainter (see ImageCanvas).
+    backend: Literal['matplotlib', 'qimage'] = os.environ.get('PYARRVIEW_BACKEND', 'matplotlib')
 
     do_transpose = False
     do_vflip = False
@@ -34,25 +67,116 @@ class ImageViewer(QTW.QWidget):
 
     wdw = 1.0
     level = 0.5
-
-    def __init__(self, array: npt.ArrayLike, parent: QMainWindow):
+    # 'global' keeps one window/level for all frames, 'frame' auto-contrasts
+    # every frame as it is shown.
+    scaling: Literal['global', 'frame'] = 'global'
+
+    # Reused between frames, see update_image.
+    canvas = None
+    image = None
+    background = None
+    cframe = None
+    # Pyramid reduction of the displayed frame, and (key, frame) of the
+    # reduced complex frame the Complex view re-colorizes while window/level
+    # is dragged, see complex_frame.
+    factor = 1
+    complex_cache = None
+    resize_pending = False
+
+    # Prepared frames are cached up to this many bytes per viewer, and this
+    # many frames are prefetched along the dynamic dimension.
+    cache_bytes = int(os.environ.get('PYARRVIEW_CACHE_MB', 256)) << 20
+    prefetch_frames = 8
+
+    # Per-frame statistics of the whole array are gathered when a window
+    # opens only for arrays up to this size; otherwise on demand (double
+    # click, Per-Frame Scaling or the context menu), since scanning reads
+    # every byte of a memory-mapped file.
+    stats_auto_bytes = int(os.environ.get('PYARRVIEW_STATS_AUTO_MB', 256)) << 20
+
+    # Longer dynamic dimensions are shown in the montage with a stride.
+    montage_max_tiles = 1024
+
+    # Interactive changes redraw at most this often; 0 follows the refresh
+    # rate of the screen.
+    max_fps = float(os.environ.get('PYARRVIEW_MAX_FPS', 0))
+
+    # Fourier transforms offered next to the view mode, see spectral. 2D
+    # runs over the row and column dimensions, 1D along the dynamic one.
+    fourier_views = ('Image', 'FFT 2D', 'IFFT 2D', 'FFT 1D', 'IFFT 1D')
+
+    # Performance overlay (set_hud) and the profiling stages it lists
+    hud = None
+    hud_stages = ('slice', 'prepare', 'complex2rgb', 'colormap', 'draw', 'paint', 'ipc receive', 'open array')
+
+    def __init__(self, array: npt.ArrayLike, parent: QMainWindow, grid: int = None):
         """
         Stores off container for later use; sets up the main panel display
         canvas for plotting into with matplotlib. Also prepares the interface
         for working with multi-dimensional data.
+
+        With grid, the last dimension holds several arrays (see
+        transport.share_stack) that are shown side by side in grid columns,
+        as one montage with shared slicing and window/level.
         """
         super().__init__(parent)
 
         logging.info("Image constructor.")
         self.data = array
+        self.grid = grid
         self.ndim = array.ndim
+        self.renderer = LutRenderer()
+        # View type -> Histogram of the whole volume, computed on request.
+        self.volume_hists = {}
+        # Per-frame statistics (see StatsIndex) by stats_key, None if a
+        # chunk failed, and the ones being built with their number of
+        # outstanding and failed chunks.
+        self.stats_indexes = {}
+        self.stats_building = {}
+        self.frame_cache = FrameCache(self.cache_bytes)
+        # Projections before the view pipeline, so changing the view type or
+        # orientation does not reduce the data again.
+        self.projection_cache = FrameCache(self.cache_bytes)
+        self.last_projection = None
+        self.projecting = set()
+        # Part of every cache key, bumped when the data changes so that
+        # frames still being prefetched from the old data never match.
+        self.data_version = 0
+        self.prefetching = set()
+        # Frame requests: the latest one (key, slices, state) not shown yet,
+        # and the key of the one being computed on the compute pool.
+        self.wanted = None
+        self.computing = None
+        # Auto-level requests: the number of the latest one, and whether it
+        # is still being computed (frames are not drawn meanwhile).
+        self.levels_request = 0
+        self.levels_pending = False
+
+        # Update scheduler, see schedule_update
+        self.dirty = False
+        self.last_render = 0.0
+        self.update_timer = QtCore.QTimer(self)
+        self.update_timer.setSingleShot(True)
+        self.update_timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.update_timer.timeout.connect(self.render_scheduled)
+        # Playback statistics, see playback_stats
+        self.shown_times = deque(maxlen=240)
+        self.frames_shown = 0
+        self.frames_dropped = 0
+        self.play_start = None
+        self.last_position = None
+        self.direction = 1
 
         # Connect parent signals
         parent.change_cmap.connect(self.change_cmap)
         parent.save_video.connect(self.save_movie)
+        parent.change_backend.connect(self.set_backend)
+        parent.change_scaling.connect(self.set_scaling)
+        parent.show_hud.connect(self.set_hud)
 
         # Main layout
         layout = QTW.QVBoxLayout(self)
+        self.main_layout = layout
 
         # Dimension controls; Add a widget with a horizontal layout
         cw = QTW.QWidget()
@@ -62,7 +186,9 @@ class ImageViewer(QTW.QWidget):
 
         # Create a drop-down for the image instance
         self.dim_selector = DimensionSelector(self.data.shape)
-        self.dim_selector.indicesUpdatedSignal.connect(self.update_image)
+        if self.grid is not None:
+            self.dim_selector.hide_dimension(self.ndim - 1)
+        self.dim_selector.indicesUpdatedSignal.connect(self.schedule_update)
         controls.addWidget(self.dim_selector)
 
         # TODO: We can disable widgets for singleton dimensions
@@ -110,18 +236,7 @@ class ImageViewer(QTW.QWidget):
 
 
         layout.setContentsMargins(0,0,0,0)
-        self.fig = Figure(figsize=(6,6),
-                          dpi=72,
-                          facecolor=(1,1,1),
-                          edgecolor=(0,0,0),
-                          layout='constrained')
-
-        self.ax = self.fig.add_subplot(111)
-        self.canvas = FigureCanvas(self.fig)
-        self.canvas.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents)
-        self.canvas.setSizePolicy(QTW.QSizePolicy.Expanding,
-                                  QTW.QSizePolicy.Expanding)
-        layout.addWidget(self.canvas)
+        self.create_canvas()
         # layout.addWidget(NavigationToolbar(self.canvas, self)) # TODO: This toolbar provides nice features, but coincides with contrast adjustments  mouse drag. Can be activated if fixed.
 
         self.label_base = "A{:d}/S{:d}/C{:d}/P{:d}/R{:d}/S{:d}"
@@ -135,16 +250,27 @@ class ImageViewer(QTW.QWidget):
 
         # Image view mode: Magnitude, Real, Imaginary, Phase, Complex
         self.viewmode_box = QTW.QComboBox()
-        if np.iscomplexobj(array):
-            self.viewmode_box.addItems(['Complex', 'Magnitude', 'Phase', 'Real', 'Imag'])
-            self.viewmode_box.setCurrentText('Magnitude')
-        else:
-            self.viewmode_box.addItems(['Real', 'Magnitude'])
-            self.viewmode_box.setCurrentText('Real')
+        self.set_view_modes(np.iscomplexobj(array))
 
-        self.viewmode_box.currentTextChanged.connect(self.update_image)
+        self.viewmode_box.currentTextChanged.connect(self.schedule_update)
         controls.addWidget(self.viewmode_box)
 
+        # Fourier transform of the data before the view mode
+        self.transform_box = QTW.QComboBox()
+        self.transform_box.addItems(self.fourier_views)
+        self.transform_box.setToolTip("Centered (I)FFT over the row and column dimensions (2D) "
+                                      "or along the dynamic dimension (1D), of the frames on screen")
+        self.transform_box.currentTextChanged.connect(self.transform_changed)
+        controls.addWidget(self.transform_box)
+
+        # Reducer for the projection dimension (Ctrl+click a dimension)
+        self.projection_box = QTW.QComboBox()
+        self.projection_box.addItems(REDUCERS)
+        self.projection_box.setToolTip("Projection along the reduced dimension (Ctrl+click a dimension button)")
+        self.projection_box.setEnabled(False)
+        self.projection_box.currentTextChanged.connect(self.schedule_update)
+        controls.addWidget(self.projection_box)
+
         # Add quick operations
         # TODO: What if we don't have these icons on the system? Need local fallback icons. Maybe from arrShow project?
         icon_path = files('pyArrView').joinpath('resources/icons')
@@ -167,19 +293,19 @@ class ImageViewer(QTW.QWidget):
         self.flip_v_button.setToolTip("Flip vertically")
         self.transpose_btn = QTW.QPushButton(".T")
         self.transpose_btn.setCheckable(True)
-        self.transpose_btn.clicked.connect(self.update_image)
+        self.transpose_btn.clicked.connect(self.schedule_update)
         self.transpose_btn.setToolTip("Transpose")
         controls.addWidget(self.transpose_btn)
         self.fliph_btn = QTW.QPushButton()
         self.fliph_btn.setIcon(icon_flip_h)
         self.fliph_btn.setCheckable(True)
-        self.fliph_btn.clicked.connect(self.update_image)
+        self.fliph_btn.clicked.connect(self.schedule_update)
         self.fliph_btn.setToolTip("Flip Horizontally")
         controls.addWidget(self.fliph_btn)
         self.flipv_btn = QTW.QPushButton()
         self.flipv_btn.setIcon(icon_flip_v)
         self.flipv_btn.setCheckable(True)
-        self.flipv_btn.clicked.connect(self.update_image)
+        self.flipv_btn.clicked.connect(self.schedule_update)
         self.flipv_btn.setToolTip("Flip Vertically")
         controls.addWidget(self.flipv_btn)
 
@@ -194,9 +320,19 @@ class ImageViewer(QTW.QWidget):
         self.rot_ccw_btn.setToolTip("Rotate Counter-Clockwise")
         controls.addWidget(self.rot_ccw_btn)
 
+        self.montage_btn = QTW.QPushButton("Montage")
+        self.montage_btn.setCheckable(True)
+        self.montage_btn.clicked.connect(self.schedule_update)
+        self.montage_btn.setToolTip("Tile all frames along the dynamic dimension")
+        # The grid is a montage of its own
+        self.montage_btn.setEnabled(self.grid is None)
+        controls.addWidget(self.montage_btn)
+
         logging.info("Container size {}".format(str(self.image_shape())))
 
-        # Window/Level support
+        # Window/Level support; the first frame is drawn once it is set.
+        self.set_range(0, 1)
+        self.set_window(0, 1)
         self.auto_level()
 
         self.mloc = None
@@ -205,14 +341,52 @@ class ImageViewer(QTW.QWidget):
         self.timer = None
 
         self.update_image()
+        self.sync_wl_controls()
 
-        for (cont, var) in ((self.windowScaled, self.wdw),
-                            (self.levelScaled, self.level)):
-            cont.blockSignals(True)
-            cont.setValue(var * self.range)
-            cont.blockSignals(False)
+        # Statistics of all frames, in the background
+        # From shape and dtype: lazy HDF5 datasets have no nbytes.
+        if int(np.prod(self.data.shape)) * self.data.dtype.itemsize <= self.stats_auto_bytes:
+            self.stats_index(build=True)
 
 
+    def create_canvas(self):
+        "Creates the display widget for the current backend below the controls."
+        if self.backend == 'qimage':
+            self.fig = None
+            self.ax = None
+            self.canvas = ImageCanvas()
+        else:
+            from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+            from matplotlib.figure import Figure
+            self.fig = Figure(figsize=(6,6),
+                              dpi=72,
+                              facecolor=(1,1,1),
+                              edgecolor=(0,0,0),
+                              layout='constrained')
+
+            self.ax = self.fig.add_subplot(111)
+            self.canvas = FigureCanvas(self.fig)
+            self.canvas.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents)
+            self.canvas.setSizePolicy(QTW.QSizePolicy.Expanding,
+                                      QTW.QSizePolicy.Expanding)
+            self.canvas.mpl_connect('draw_event', self.on_draw)
+        # Below the two control rows
+        self.main_layout.insertWidget(2, self.canvas)
+
+    @Slot(str)
+    def set_backend(self, backend):
+        "Swaps the display canvas between 'matplotlib' and 'qimage'."
+        if backend == self.backend:
+            return
+        self.main_layout.removeWidget(self.canvas)
+        self.canvas.hide()
+        self.canvas.deleteLater()
+        self.image = None
+        self.background = None
+        self.backend = backend
+        self.create_canvas()
+        self.update_image()
+
     def image_shape(self):
         return self.data.shape
     
@@ -224,20 +398,34 @@ class ImageViewer(QTW.QWidget):
 
     def rot_img_cw(self):
         self.nrot -= 1
-        self.update_image()
+        self.schedule_update()
     def rot_img_ccw(self):
         self.nrot += 1
-        self.update_image()
+        self.schedule_update()
 
     
     def update_wl(self):
         """
         When only window / level have changed, we don't need to call imshow
-        again, just update clim.
+        again, just re-map the last frame through the colormap LUT.
         """
-        rng = self.window_level()
-        self.image.set_clim(*rng)        
-        self.canvas.draw()
+        if self.viewmode_box.currentText() == 'Complex':
+            # Window/level sets the magnitude scaling inside complex2rgb, so
+            # the kept complex frame is colorized again on the compute pool,
+            # latest drag step first. Every step gives a new clim, so these
+            # frames bypass the frame cache.
+            slices = self.display_slices()
+            state = self.view_state()
+            key = (self.data_version, slice_key(slices), state)
+            frame = self.frame_cache.get(key)
+            if frame is None:
+                self.request_frame(key, slices, state, cache=False)
+                return
+            self.wanted = None
+            self.show_frame(frame, state)
+            return
+        if self.cframe is not None:
+            self.draw_rgb(self.render_rgb(self.cframe, self.window_level()))
 
     def window_input(self, value, **kwargs):
         "Handles changes in window spinbox; scales to our [0..1] range"
@@ -288,19 +476,218 @@ class ImageViewer(QTW.QWidget):
         self.mloc = None
 
     def mouseDoubleClickEvent(self, event):
-        cimg = self.prep_image_to_display()
-        v1 = np.percentile(cimg,2)
-        v2 = np.percentile(cimg,98)
-        self.wdw = (v2-v1)/self.range
-        self.level = (v2+v1)/2/self.range
+        index = self.stats_index(build=True)
+        if index is not None:
+            self.set_display_range(*self.index_percentiles(index, 2, 98))
+            return
+        self.auto_level(keep_range=True)
+
+    def set_display_range(self, v1, v2):
+        "Sets window/level so that [v1, v2] is displayed, and syncs the spinboxes."
+        self.set_window(v1, v2)
         self.update_wl()
+        self.sync_wl_controls()
 
+    def set_window(self, v1, v2):
+        "Sets window/level so that [v1, v2] is displayed, without redrawing."
+        self.wdw = (v2-v1)/self.range
+        self.level = ((v2+v1)/2 - self.min)/self.range
+
+    def set_range(self, lo, hi):
+        "Sets the data range window/level and the spinboxes are relative to."
+        # As Python floats: the range of int16 data overflows int16, and
+        # bools cannot be subtracted.
+        self.min = float(lo)
+        self.max = float(hi)
+        # Constant frames would give a zero range; keep the scaling finite.
+        self.range = (self.max - self.min) or 1.0
+
+    def sync_wl_controls(self):
+        "Shows the current window/level in the spinboxes without triggering updates."
         for (cont, var) in ((self.windowScaled, self.wdw),
-                    (self.levelScaled, self.level)):
+                            (self.levelScaled, self.level)):
             cont.blockSignals(True)
             cont.setValue(var * self.range)
             cont.blockSignals(False)
 
+    def set_view_modes(self, complex_values):
+        "Offers the view modes for real or complex values, keeping the current one if it is among them."
+        modes = ['Complex', 'Magnitude', 'Phase', 'Real', 'Imag'] if complex_values else ['Real', 'Magnitude']
+        current = self.viewmode_box.currentText()
+        with QtCore.QSignalBlocker(self.viewmode_box):
+            self.viewmode_box.clear()
+            self.viewmode_box.addItems(modes)
+            if current not in modes:
+                current = 'Magnitude' if complex_values else 'Real'
+            self.viewmode_box.setCurrentText(current)
+
+    @Slot(str)
+    def transform_changed(self, text):
+        """
+        Spectra are complex and have a different range: offers the complex
+        view modes (magnitude first for real data) and auto-levels.
+        """
+        real_data = not np.iscomplexobj(self.data)
+        self.set_view_modes(not real_data or text != 'Image')
+        if real_data and text != 'Image' and self.viewmode_box.currentText() == 'Real':
+            with QtCore.QSignalBlocker(self.viewmode_box):
+                self.viewmode_box.setCurrentText('Magnitude')
+        index = self.stats_index()
+        global_range = index is not None and self.scaling == 'global'
+        if global_range:
+            # The controls stay relative to the range of the whole array.
+            self.set_range(*index.global_range())
+        self.auto_level(keep_range=global_range)
+        self.schedule_update()
+
+    def stats_key(self):
+        """
+        Key of the statistics index for the current view, or None if the
+        display is not a single frame of the data (projection, montage,
+        Fourier transform, 1D data).
+        """
+        rows, cols = self.dim_selector.selected_dimensions[:2]
+        if rows == cols or self.dim_selector.reduction_dimension() is not None \
+                or self.transform_box.currentText() != 'Image' \
+                or (self.grid is None and self.montage_slices() is not None):
+            return None
+        view_type = self.viewmode_box.currentText()
+        # The Complex view is windowed on the magnitude.
+        if view_type == 'Complex':
+            view_type = 'Magnitude'
+        return (self.data_version, view_type, rows, cols)
+
+    def stats_index(self, build=False):
+        """
+        Statistics index for the current view, None until it is complete.
+        With build, a missing one is built on the 'stats' pool, one task per
+        chunk.
+        """
+        key = self.stats_key()
+        if key is None:
+            return None
+        if key in self.stats_indexes or key in self.stats_building or not build:
+            return self.stats_indexes.get(key)
+        index = StatsIndex(self.image_shape(), key[2], key[3], VALUE_TRANSFORMS[key[1]])
+        chunks = index.chunks(self.data.dtype.itemsize)
+        self.stats_building[key] = [index, len(chunks), 0]
+        logging.info(f"Computing {key[1]} statistics of {len(chunks)} chunks...")
+        for chunk in chunks:
+            workers.submit(self.stats_task, key, index, chunk,
+                           callback=self.stats_chunk_done, pool='stats')
+        return None
+
+    def stats_task(self, key, index, chunk):
+        """
+        Runs on a worker thread; must not touch widgets. A chunk that fails
+        still counts as done, so the build finishes; the index is then not
+        used and the viewer scales from the frames it shows.
+        """
+        try:
+            index.add(self.data, chunk)
+        except Exception as e:
+            logging.error(f"Could not compute statistics of {chunk}: {e!r}")
+            return key, False
+        return key, True
+
+    def stats_chunk_done(self, result):
+        key, ok = result
+        entry = self.stats_building.get(key)
+        if entry is None:
+            # Data changed meanwhile
+            return
+        entry[1] -= 1
+        entry[2] += not ok
+        if entry[1] > 0:
+            return
+        del self.stats_building[key]
+        if entry[2]:
+            logging.warning(f"{key[1]} statistics incomplete, {entry[2]} chunks failed")
+            self.stats_indexes[key] = None
+            return
+        self.stats_indexes[key] = entry[0]
+        if key == self.stats_key():
+            self.stats_ready(entry[0])
+
+    def stats_ready(self, index):
+        """
+        With global scaling, the window/level controls become relative to the
+        range of the whole array, the displayed range stays. Per-frame scaling
+        switches to the index for the current frame.
+        """
+        if self.scaling == 'frame':
+            self.update_image()
+            return
+        v1, v2 = self.window_level()
+        self.set_range(*index.global_range())
+        self.set_window(v1, v2)
+        self.sync_wl_controls()
+
+    def frame_auto_level(self, v1=2, v2=98):
+        """
+        Per-frame scaling: sets range and window/level from the statistics
+        index for the current frame, which must be ready.
+        """
+        index = self.stats_index()
+        frames = self.index_frames(index)
+        self.set_range(min(index.min[i] for i in frames), max(index.max[i] for i in frames))
+        self.set_window(*self.index_percentiles(index, v1, v2))
+        self.sync_wl_controls()
+
+    def index_frames(self, index):
+        "Entries of the statistics index on screen: the frame, or every panel of a grid."
+        i = index.frame_index(self.dim_selector.get_current_slices())
+        if self.grid is None:
+            return [i]
+        # The grid dimension is the last one, so also last in the index.
+        return [i[:-1] + (p,) for p in range(self.image_shape()[-1])]
+
+    def index_percentiles(self, index, v1, v2):
+        "Percentiles v1, v2 of the frame on screen; for a grid the widest over its panels."
+        lows, highs = zip(*(index.frame_percentiles(i, (v1, v2)) for i in self.index_frames(index)))
+        return min(lows), max(highs)
+
+    @Slot(str)
+    def set_scaling(self, scaling):
+        "Switches between one window/level for all frames ('global') and per frame ('frame')."
+        self.scaling = scaling
+        if scaling == 'frame':
+            # Builds the statistics index if needed
+            self.update_image()
+            return
+        index = self.stats_index()
+        if index is not None:
+            self.set_range(*index.global_range())
+            self.set_display_range(*index.global_percentiles((2, 98)))
+
+    def volume_auto_level(self, v1=2, v2=98):
+        """
+        Auto-contrast over all slices. The volume histogram is built once per
+        view type on the worker pool, the window is set when it is ready.
+        """
+        if self.transform_box.currentText() != 'Image':
+            # The histogram is of the data, not of its spectrum.
+            self.auto_level(v1, v2)
+            return
+        view_type = self.viewmode_box.currentText()
+        hist = self.volume_hists.get(view_type)
+        if hist is not None:
+            self.set_display_range(*hist.percentiles((v1, v2)))
+            return
+        logging.info(f"Computing {view_type} histogram of the whole array...")
+        workers.submit(self.compute_volume_histogram, view_type,
+                       callback=self.volume_histogram_ready)
+
+    def compute_volume_histogram(self, view_type):
+        "Runs on a worker thread; must not touch widgets."
+        return view_type, volume_histogram(self.data, VALUE_TRANSFORMS[view_type])
+
+    def volume_histogram_ready(self, result):
+        view_type, hist = result
+        self.volume_hists[view_type] = hist
+        if view_type == self.viewmode_box.currentText() and self.transform_box.currentText() == 'Image':
+            self.set_display_range(*hist.percentiles((2, 98)))
+
     def wheelEvent(self, event):
         "Handle scroll event; could use some time-based limiting."
         dim_i = self.dim_selector.dynamic_dimension()
@@ -327,18 +714,37 @@ class ImageViewer(QTW.QWidget):
         menu = QTW.QMenu(self)
         saveAction = menu.addAction("Save Frame")
         plotFrameAction = menu.addAction("Plot Frame")
+        volumeLevelAction = menu.addAction("Auto Level (All Slices)")
+        statsAction = menu.addAction("Frame Statistics (All Slices)")
+        stats_key = self.stats_key()
+        statsAction.setEnabled(stats_key is not None and stats_key not in self.stats_indexes
+                               and stats_key not in self.stats_building)
 
         action = menu.exec(self.mapToGlobal(event.pos()))
 
+        if action == volumeLevelAction:
+            self.volume_auto_level()
+
+        if action == statsAction:
+            self.stats_index(build=True)
+
         if action == saveAction:
             savefilepath = QTW.QFileDialog.getSaveFileName(self, "Save image as...", filter="Images (*.png, *.jpg, *.svg, *.eps, *.pdf);;MAT file (*.mat);;NPY file (*.npy)")
             print(savefilepath)
             sel_filter = savefilepath[1]
             if len(savefilepath[0]) != 0:
-                if sel_filter == "Images (*.png, *.jpg, *.svg, *.eps, *.pdf)":
+                if sel_filter == "Images (*.png, *.jpg, *.svg, *.eps, *.pdf)" and self.backend == 'qimage':
+                    # Export the displayed pixels; matplotlib only writes the file.
+                    from matplotlib.image import imsave
+                    imsave(savefilepath[0], self.canvas.buffer)
+                elif sel_filter == "Images (*.png, *.jpg, *.svg, *.eps, *.pdf)":
                     extent = self.ax.get_window_extent().transformed(self.fig.dpi_scale_trans.inverted())
+                    # Animated artists are skipped by savefig.
+                    self.image.set_animated(False)
                     self.fig.savefig(savefilepath[0], bbox_inches=extent)
+                    self.image.set_animated(True)
                 elif sel_filter == "MAT file (*.mat)":
+                    import scipy.io as spio
                     spio.savemat(savefilepath[0], {'data': self.current_frame()})
                 elif sel_filter == "NPY file (*.npy)":
                     np.save(savefilepath[0], self.current_frame())
@@ -346,6 +752,7 @@ class ImageViewer(QTW.QWidget):
 
         elif action == plotFrameAction:
             wl = self.window_level()
+            plt = pyplot()
             plt.figure()
             plt.imshow(self.current_frame(), 
                            vmin=wl[0],
@@ -357,17 +764,57 @@ class ImageViewer(QTW.QWidget):
             plt.draw()
             plt.show(block=False)
 
-    def auto_level(self, v1=2, v2=98):
-        cimg = self.prep_image_to_display()
-
-        self.min = cimg.min()
-        self.max = cimg.max()
-        self.range = self.max - self.min
-        
-        v1 = np.percentile(cimg,v1)
-        v2 = np.percentile(cimg,v2)
-        self.wdw = (v2-v1)/self.range
-        self.level = (v2+v1)/2/self.range
+    def auto_level(self, v1=2, v2=98, keep_range=False):
+        """
+        Sets window/level to the v1 and v2 percentiles of the values on
+        screen (the magnitude for the Complex view), and unless keep_range
+        the range to their min and max. Uses the frame if it is cached;
+        otherwise it is computed on the compute pool and levels_ready sets
+        the window when it is ready, the latest request winning.
+        """
+        slices = self.display_slices()
+        state = self.view_state(with_clim=False)
+        self.levels_request += 1
+        if state.view_type != 'Complex':
+            frame = self.frame_cache.get((self.data_version, slice_key(slices), state))
+            if frame is not None:
+                self.levels_pending = False
+                self.levels_ready((self.levels_request, *self.frame_levels(frame, v1, v2), keep_range))
+                return
+        self.levels_pending = True
+        workers.submit(self.levels_task, self.levels_request, slices, state, v1, v2, keep_range,
+                       callback=self.levels_ready, pool='compute')
+
+    @staticmethod
+    def frame_levels(values, v1, v2):
+        "(min, max) and the v1, v2 percentiles of a frame."
+        lo, hi = np.nanmin(values), np.nanmax(values)
+        return (lo, hi), frame_percentiles(values, (v1, v2), lo, hi)
+
+    def levels_task(self, request, slices, state, v1, v2, keep_range):
+        "Runs on a worker thread; must not touch widgets."
+        try:
+            if state.view_type == 'Complex':
+                values = np.abs(self.complex_frame(slices, state))
+            else:
+                values = self.cached_frame(slices, state)
+            return (request, *self.frame_levels(values, v1, v2), keep_range)
+        except Exception as e:
+            logging.error(f"Could not auto-level frame {slices}: {e!r}")
+            return request, None, None, keep_range
+
+    def levels_ready(self, result):
+        request, data_range, window, keep_range = result
+        if request != self.levels_request:
+            # Superseded by a newer request
+            return
+        self.levels_pending = False
+        if window is not None:
+            if not keep_range:
+                self.set_range(*data_range)
+            self.set_window(*window)
+            self.sync_wl_controls()
+        self.update_wl()
 
     def window_level(self):
         "Perform calculations of (min,max) display range from window/level"
@@ -379,39 +826,457 @@ class ImageViewer(QTW.QWidget):
         # return None
 
     def current_frame(self):
-        return self.data[self.dim_selector.get_current_slices()].squeeze()
+        "Data of the frame on screen, Fourier transformed if the view is."
+        slices = self.dim_selector.get_current_slices()
+        return read_transformed(self.data, slices, self.view_state(with_clim=False).transform).squeeze()
     
+    def view_state(self, with_clim=True):
+        """
+        Snapshot of the display options for the frame pipeline. The pyramid
+        factor follows the size of the image area; with_clim=False leaves
+        out the Complex view's magnitude limits.
+        """
+        view_type = self.viewmode_box.currentText()
+        state = ViewState(view_type=view_type,
+                          transpose=self.transpose_btn.isChecked(),
+                          flipv=self.flipv_btn.isChecked(),
+                          fliph=self.fliph_btn.isChecked(),
+                          nrot=self.nrot % 4,
+                          clim=tuple(map(float, self.window_level())) if view_type == 'Complex' and with_clim else None)
+        slices = self.montage_slices()
+        if slices is None:
+            slices = self.dim_selector.get_current_slices()
+        elif self.grid is not None:
+            state = state._replace(montage=(self.ndim - 1, self.grid))
+        else:
+            dim_i = self.dim_selector.dynamic_dimension()
+            n_tiles = len(range(self.image_shape()[dim_i])[slices[dim_i]])
+            state = state._replace(montage=(dim_i, montage_grid(n_tiles)[1]))
+        reduce_i = self.dim_selector.reduction_dimension()
+        if reduce_i is not None:
+            state = state._replace(projection=(reduce_i, self.projection_box.currentText()))
+        fourier = self.transform_box.currentText()
+        if fourier != 'Image':
+            kind, ndim = fourier.split()
+            axes = tuple(self.dim_selector.selected_dimensions[:2]) if ndim == '2D' \
+                else (self.dim_selector.dynamic_dimension(),)
+            state = state._replace(transform=(kind, axes))
+        shape = frame_shape(self.image_shape(), slices, state)
+        if len(shape) != 2:
+            return state
+        return state._replace(factor=pyramid_factor(shape, self.display_size()))
+
+    def montage_slices(self):
+        """
+        Slices of all montage tiles along the dynamic dimension (strided to
+        at most montage_max_tiles), or None when not showing a montage. A
+        grid always shows all of its panels.
+        """
+        if self.grid is not None:
+            slices = list(self.dim_selector.get_current_slices())
+            slices[-1] = slice(0, self.image_shape()[-1])
+            return tuple(slices)
+        if not self.montage_btn.isChecked():
+            return None
+        dim_i = self.dim_selector.dynamic_dimension()
+        n = self.image_shape()[dim_i]
+        if n <= 1 or dim_i in self.dim_selector.selected_dimensions[:2] \
+                or dim_i == self.dim_selector.reduction_dimension():
+            return None
+        slices = list(self.dim_selector.get_current_slices())
+        slices[dim_i] = slice(0, n, -(-n // self.montage_max_tiles))
+        return tuple(slices)
+
+    def display_slices(self):
+        "Slices of the data on screen: the current frame or the montage tiles."
+        slices = self.montage_slices()
+        if slices is None:
+            return self.dim_selector.get_current_slices()
+        return slices
+
+    def display_size(self):
+        "Size (rows, columns) of the image area in device pixels."
+        if self.backend == 'qimage':
+            ratio = self.canvas.devicePixelRatioF()
+            return self.canvas.height() * ratio, self.canvas.width() * ratio
+        return self.ax.bbox.height, self.ax.bbox.width
+
+    def complex_frame(self, slices, state):
+        """
+        Oriented and reduced complex frame (or montage) that the Complex view
+        colorizes, kept while only window/level changes. Safe to run on
+        worker threads.
+        """
+        key = (self.data_version, slice_key(slices), state._replace(view_type='Complex', clim=None))
+        cached = self.complex_cache
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        if state.montage is not None:
+            src = montage_source(*self.tile_reader(slices, state), key[2])
+        else:
+            src = complex_source(self.read(slices, state), state)
+        self.complex_cache = (key, src)
+        return src
+
+    def resizeEvent(self, event):
+        "Switches pyramid level when the image area has grown or shrunk enough."
+        super().resizeEvent(event)
+        if self.cframe is not None and not self.resize_pending:
+            self.resize_pending = True
+            QtCore.QTimer.singleShot(0, self.display_resized)
+
+    def display_resized(self):
+        self.resize_pending = False
+        if self.view_state().factor != self.factor:
+            self.update_image()
+
     def prep_image_to_display(self, cimg=None):
         """
         Prepares the image to be displayed by applying the selected view type
-        and any transformations (transpose, flip, rotate).
+        and any transformations (transpose, flip, rotate). The current frame
+        comes from the frame cache.
         """
-        if cimg is None:
-            cimg = self.current_frame()
-        
-        view_type = self.viewmode_box.currentText()
-        if view_type == 'Magnitude':
-            cimg = np.abs(cimg)
-        elif view_type == 'Real':
-            cimg = np.real(cimg)
-        elif view_type == 'Imag':
-            cimg = np.imag(cimg)
-        elif view_type == 'Phase':
-            cimg = np.angle(cimg)
-        elif view_type == 'Complex':
-            cimg, _ = complex2rgb(cimg, clim=self.window_level())
-    
-        if self.transpose_btn.isChecked():
-            cimg = cimg.T
-        if self.flipv_btn.isChecked():
-            cimg = np.flipud(cimg)
-        if self.fliph_btn.isChecked():
-            cimg = np.fliplr(cimg)
-        if self.nrot != 0:
-            cimg = np.rot90(cimg, self.nrot, axes=(0,1))
-
-        return cimg
-    
+        if cimg is not None:
+            return prepare_frame(cimg, self.view_state())
+        return self.cached_frame(self.display_slices(), self.view_state())
+
+    def compute_frame(self, slices, state):
+        """
+        Slices and prepares a frame that owns its memory, so a cached frame
+        never points into the (possibly slow, memory-mapped) source. Safe to
+        run on worker threads.
+        """
+        if state.view_type == 'Complex':
+            # Window/level only colorizes the kept complex frame again.
+            src = self.complex_frame(slices, state)
+            with span('prepare'):
+                return finish_frame(src, state)
+        if state.montage is not None:
+            # Sliced and prepared batch by batch
+            with span('prepare'):
+                frame = prepare_montage(*self.tile_reader(slices, state), state)
+            return frame
+        with span('slice'):
+            cimg = self.read(slices, state)
+        with span('prepare'):
+            frame = prepare_frame(cimg, state)
+        if not frame.flags.owndata:
+            frame = frame.copy()
+        return frame
+
+    def projection_key(self, slices, state):
+        return (self.data_version, slice_key(slices), state.projection, state.transform)
+
+    def read(self, slices, state):
+        """
+        read_frame, with projections and 1D Fourier transforms taken from
+        (and stored in) the projection cache. Safe to run on worker threads.
+        """
+        if state.projection is None and state.transform is not None and len(state.transform[1]) == 1:
+            return arrange(self.transformed_block(slices, state.transform), state)
+        if state.projection is None:
+            return read_frame(self.data, slices, state)
+        key = self.projection_key(slices, state)
+        proj = self.projection_cache.get(key)
+        if proj is None and self.last_projection is not None and self.last_projection[0] == key:
+            # Larger than the cache budget
+            proj = self.last_projection[1]
+        if proj is None:
+            proj = project(self.data, slices, *state.projection, transform=state.transform)
+            self.projection_cache.put(key, proj)
+        return arrange(proj, state)
+
+    def tile_reader(self, slices, state):
+        """
+        pipeline.tile_reader for the montage tiles of slices. Projections and
+        1D transforms are computed (and cached) whole, their tiles are
+        batches of that.
+        """
+        if state.projection is None and (state.transform is None or len(state.transform[1]) > 1):
+            return tile_reader(self.data, slices, state)
+        stack = self.read(slices, state)
+        return (lambda start, stop: stack[start:stop]), len(stack)
+
+    def transformed_block(self, slices, transform):
+        """
+        data[slices] transformed along the axis of a 1D transform. The axis
+        is transformed whole, so that block is cached: stepping along it
+        then only slices.
+        """
+        axis, = transform[1]
+        full = (*slices[:axis], slice(0, self.image_shape()[axis]), *slices[axis+1:])
+        key = (self.data_version, slice_key(full), None, transform)
+        block = self.projection_cache.get(key)
+        if block is None:
+            block = read_transformed(self.data, full, transform)
+            self.projection_cache.put(key, block)
+        return block[(slice(None),) * axis + (slices[axis],)]
+
+    def request_projection(self, slices, state):
+        """
+        Starts computing the projection for slices on the worker pool unless
+        it is ready. Returns True if the display has to wait for it.
+        """
+        key = self.projection_key(slices, state)
+        if key in self.projection_cache or \
+                (self.last_projection is not None and self.last_projection[0] == key):
+            return False
+        self.label.setText("Projecting...")
+        if key not in self.projecting:
+            self.projecting.add(key)
+            workers.submit(self.projection_task, key, slices, state,
+                           callback=self.projection_done)
+        return True
+
+    def projection_task(self, key, slices, state):
+        "Runs on a worker thread; must not touch widgets."
+        return key, project(self.data, slices, *state.projection, transform=state.transform)
+
+    def projection_done(self, result):
+        key, proj = result
+        self.projecting.discard(key)
+        if key[0] != self.data_version:
+            return
+        self.projection_cache.put(key, proj)
+        self.last_projection = result
+        self.update_image()
+
+    def cached_frame(self, slices, state):
+        key = (self.data_version, slice_key(slices), state)
+        frame = self.frame_cache.get(key)
+        if frame is None:
+            frame = self.compute_frame(slices, state)
+            self.frame_cache.put(key, frame)
+        return frame
+
+    def prefetch(self, wrap=False):
+        """
+        Prepares the next frames along the dynamic dimension, in the direction
+        the user is moving, on the worker pool. With wrap, indices continue at
+        the other end (animation).
+        """
+        dim_i = self.dim_selector.dynamic_dimension()
+        slices = self.dim_selector.get_current_slices()
+        cur = slices[dim_i]
+        n = self.image_shape()[dim_i]
+        if cur.stop - cur.start != 1 or n <= 1 or self.montage_slices() is not None \
+                or self.dim_selector.reduction_dimension() is not None:
+            return
+        state = self.view_state()
+        for k in range(1, min(self.prefetch_frames, n - 1) + 1):
+            i = cur.start + k * self.direction
+            if wrap:
+                i %= n
+            elif not 0 <= i < n:
+                break
+            slcs = (*slices[:dim_i], slice(i, i+1), *slices[dim_i+1:])
+            key = (self.data_version, slice_key(slcs), state)
+            if key in self.prefetching or key in self.frame_cache:
+                continue
+            self.prefetching.add(key)
+            workers.submit(self.prefetch_task, key, slcs, state,
+                           callback=self.prefetch_done)
+
+    def prefetch_task(self, key, slices, state):
+        """
+        Runs on a worker thread; must not touch widgets. Returns the key even
+        if the frame fails, so that prefetch_done releases it and start_frame
+        computes it on the compute pool if it is wanted.
+        """
+        try:
+            self.frame_cache.put(key, self.compute_frame(slices, state))
+        except Exception as e:
+            logging.error(f"Could not prefetch frame {slices}: {e!r}")
+        return key
+
+    def prefetch_done(self, key):
+        self.prefetching.discard(key)
+        if self.wanted is not None and self.wanted[0] == key and self.computing is None:
+            self.start_frame()
+
+    def request_frame(self, key, slices, state, cache=True):
+        """
+        Shows a frame that is not cached yet once it has been computed on the
+        compute pool. At most one frame per viewer is computed at a time:
+        requests made meanwhile replace each other, and only the latest one
+        is started when the running one finishes, so fast scrolling never
+        queues up stale frames. Without cache, the frame is not kept.
+        """
+        if self.wanted is not None:
+            self.frames_dropped += 1
+        self.wanted = (key, slices, state, cache)
+        if self.computing is None:
+            self.start_frame()
+
+    def start_frame(self):
+        "Starts computing the latest requested frame, or shows it if it got cached meanwhile."
+        key, slices, state, cache = self.wanted
+        frame = self.frame_cache.get(key)
+        if frame is not None:
+            self.wanted = None
+            self.show_frame(frame, state)
+            return
+        if key in self.prefetching:
+            # prefetch_done starts it again
+            return
+        self.computing = key
+        workers.submit(self.frame_task, key, slices, state, cache,
+                       callback=self.frame_ready, pool='compute')
+
+    def frame_task(self, key, slices, state, cache=True):
+        "Runs on a worker thread; must not touch widgets."
+        try:
+            frame = self.compute_frame(slices, state)
+        except Exception as e:
+            logging.error(f"Could not compute frame {slices}: {e!r}")
+            return key, None, state
+        if cache:
+            self.frame_cache.put(key, frame)
+        return key, frame, state
+
+    def frame_ready(self, result):
+        key, frame, state = result
+        self.computing = None
+        if self.wanted is None:
+            return
+        if self.wanted[0] != key:
+            # The user moved on meanwhile; the latest request wins.
+            self.start_frame()
+            return
+        self.wanted = None
+        if frame is not None:
+            self.show_frame(frame, state)
+
+    def track_direction(self):
+        "Remembers which way the dynamic dimension is being stepped through."
+        dim_i = self.dim_selector.dynamic_dimension()
+        position = (dim_i, self.dim_selector.get_current_slices()[dim_i].start)
+        if self.last_position is not None and self.last_position[0] == dim_i \
+                and position[1] != self.last_position[1]:
+            step = position[1] - self.last_position[1]
+            # Wrapping around during animation keeps the direction.
+            if abs(step) == 1:
+                self.direction = step
+        self.last_position = position
+
+    def set_data(self, array):
+        """
+        Replaces the displayed data with a same-shaped array (None if it was
+        modified in place), keeping slices, window/level and colormap. Bursts
+        of updates are coalesced into one redraw.
+        """
+        if array is not None:
+            self.data = array
+        self.data_version += 1
+        self.frame_cache.clear()
+        self.projection_cache.clear()
+        self.last_projection = None
+        self.stats_indexes.clear()
+        self.stats_building.clear()
+        self.volume_hists.clear()
+        self.schedule_update()
+
+    @Slot(bool)
+    def set_hud(self, on):
+        """
+        Shows or hides an overlay with the display rate and the time spent
+        in each stage of showing a frame (see profiling), the frame cache
+        hit rate and the memory of the viewer process.
+        """
+        if not on:
+            if self.hud is not None:
+                self.hud.deleteLater()
+                self.hud = None
+            return
+        if self.hud is not None:
+            return
+        self.hud = QTW.QLabel(self)
+        self.hud.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents)
+        self.hud.setStyleSheet("background: rgba(0, 0, 0, 160); color: white; "
+                               "font-family: monospace; padding: 4px;")
+        timer = QtCore.QTimer(self.hud)
+        timer.timeout.connect(self.update_hud)
+        timer.start(500)
+        self.update_hud()
+        self.hud.show()
+
+    def update_hud(self):
+        stats = self.playback_stats()
+        times = profiling.stage_times()
+        lines = [f"{stats['fps']:.1f} fps, {stats['dropped']} dropped"]
+        lines += [f"{name:<12}{times[name] * 1e3:7.2f} ms" for name in self.hud_stages if name in times]
+        lines.append(f"cache {self.frame_cache.hit_rate():.0%} hits, {self.frame_cache.nbytes / 2**20:.0f} MiB")
+        rss = profiling.rss_bytes()
+        if rss is not None:
+            lines.append(f"memory {rss / 2**20:.0f} MiB")
+        self.hud.setText('\n'.join(lines))
+        self.hud.adjustSize()
+        # Over the top left of the canvas, which set_backend may replace
+        self.hud.move(self.canvas.geometry().topLeft() + QtCore.QPoint(6, 6))
+        self.hud.raise_()
+
+    def refresh_interval(self):
+        "Minimum time between scheduled redraws [s]."
+        fps = self.max_fps
+        if fps <= 0:
+            screen = self.screen()
+            fps = screen.refreshRate() if screen is not None else 0
+        return 1.0 / (fps if fps > 0 else 60.0)
+
+    @Slot()
+    def schedule_update(self):
+        """
+        Marks the view as changed. It is redrawn once at the next refresh
+        interval with whatever the state is then, so bursts of slice changes
+        (wheel, trackpad, spinbox, playback) collapse into one redraw instead
+        of queueing one each.
+        """
+        if self.dirty:
+            # An intermediate state that will never be shown
+            self.frames_dropped += 1
+            return
+        self.dirty = True
+        wait = self.last_render + self.refresh_interval() - time.perf_counter()
+        self.update_timer.start(max(0, round(wait * 1e3)))
+
+    def render_scheduled(self):
+        self.dirty = False
+        self.last_render = time.perf_counter()
+        self.update_image()
+
+    def playback_stats(self):
+        """
+        Returns a dict with the display rate over the last second ('fps'), and
+        the number of frames shown and dropped (superseded before they were
+        drawn, or skipped by playback to keep the frame rate) so far.
+        """
+        now = time.perf_counter()
+        recent = [t for t in self.shown_times if now - t <= 1.0]
+        fps = (len(recent) - 1) / (recent[-1] - recent[0]) if len(recent) > 1 and recent[-1] > recent[0] else 0.0
+        return dict(fps=fps, shown=self.frames_shown, dropped=self.frames_dropped)
+
+    def set_view(self, view=None, cmap=None, wl=None, backend=None, scaling=None):
+        """
+        Changes display settings programmatically.
+
+        Args:
+            view: View type, e.g. 'Magnitude' or 'Phase'
+            cmap: matplotlib colormap name
+            wl: (min, max) display range
+            backend: 'matplotlib' or 'qimage'
+            scaling: 'global' or 'frame' (auto-contrast every frame)
+        """
+        if backend is not None:
+            self.set_backend(backend)
+        if scaling is not None:
+            self.set_scaling(scaling)
+        if view is not None and self.viewmode_box.findText(view) >= 0:
+            self.viewmode_box.setCurrentText(view)
+        if cmap is not None:
+            self.change_cmap(cmap)
+        if wl is not None:
+            self.set_display_range(*wl)
+
     @Slot(str)
     def change_cmap(self, cmap):
         self.cmap = cmap
@@ -423,22 +1288,105 @@ class ImageViewer(QTW.QWidget):
         Updates the displayed image when a set of indicies (frame/coil/slice)
         is selected. Connected to singals from the related spinboxes.
         """
-        # TODO: Add support for third dimension with montage.
         # TODO: Add support for image modifiers (transpose, flip, rotate, fft, etc.)
         # TODO: Add support for 1D plots.
         # TODO: Add support for ROI selection.
-        cframe = self.prep_image_to_display()
-        wl = self.window_level()
-        self.ax.clear()
-        self.image = \
-            self.ax.imshow(cframe, 
-                            vmin=wl[0],
-                            vmax=wl[1],
-                            cmap=self.cmap)
-
-        self.ax.set_xticks([])
-        self.ax.set_yticks([])
-        self.canvas.draw()
+        self.projection_box.setEnabled(self.dim_selector.reduction_dimension() is not None)
+        slices = self.display_slices()
+        if self.scaling == 'frame' and self.stats_index(build=True) is not None:
+            # Before the view state, the Complex view colorizes with it.
+            self.frame_auto_level()
+        state = self.view_state()
+        if state.projection is not None and self.request_projection(slices, state):
+            # Redrawn by projection_done
+            return
+        self.label.setText("")
+        self.track_direction()
+        self.prefetch(wrap=self.timer is not None)
+
+        # Cached frames are shown right away, others are computed off the
+        # GUI thread and shown by frame_ready.
+        key = (self.data_version, slice_key(slices), state)
+        frame = self.frame_cache.get(key)
+        if frame is None:
+            self.request_frame(key, slices, state)
+            return
+        self.wanted = None
+        self.show_frame(frame, state)
+
+    def show_frame(self, cframe, state):
+        "Draws a prepared frame with the current colormap and window/level."
+        if self.scaling == 'frame' and cframe.ndim == 2 and self.stats_index() is None:
+            # Per-frame scaling while the index is being built
+            self.set_range(np.nanmin(cframe), np.nanmax(cframe))
+            self.set_window(*frame_percentiles(cframe, (2, 98), self.min, self.max))
+            self.sync_wl_controls()
+        self.factor = state.factor
+        self.cframe = cframe
+        if self.levels_pending:
+            # Drawn by levels_ready
+            return
+        self.frames_shown += 1
+        self.shown_times.append(time.perf_counter())
+        if self.timer is not None:
+            stats = self.playback_stats()
+            self.label.setText(f"{stats['fps']:.1f} fps, {stats['dropped']} dropped")
+        self.draw_rgb(self.render_rgb(cframe, self.window_level()))
+
+    def render_rgb(self, cframe, wl):
+        """
+        Applies window/level and the colormap through the cached LUT, into
+        buffers reused from frame to frame. RGB frames (Complex view) are
+        only converted to uint8.
+        """
+        with span('colormap'):
+            if cframe.ndim == 3:
+                return self.renderer.render_rgb(cframe)
+            return self.renderer.render(cframe, wl[0], wl[1], get_lut(self.cmap))
+
+    def draw_rgb(self, rgb):
+        "Puts rendered pixels on the canvas."
+        with span('draw'):
+            if self.backend == 'qimage':
+                self.canvas.set_frame(rgb)
+                return
+
+            # Fast path: same frame geometry, swap the pixels of the existing
+            # artist and blit it over the cached background.
+            if self.image is not None and self.image.get_array().shape == rgb.shape:
+                self.image.set_data(rgb)
+                self.blit_image()
+                return
+
+            # Shape or view mode (RGB vs. scalar) changed, rebuild the axes.
+            self.ax.clear()
+            self.image = self.ax.imshow(rgb, animated=True)
+
+            self.ax.set_xticks([])
+            self.ax.set_yticks([])
+            self.canvas.draw()
+
+    def on_draw(self, event):
+        """
+        Called after every full canvas draw (including resizes); caches the
+        background without the image for blitting and draws the image on top.
+        """
+        if event.canvas is not self.canvas:
+            # A draw of the canvas set_backend has just replaced.
+            return
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        if self.image is not None:
+            # The canvas repaints from the renderer after the draw, no blit needed.
+            self.ax.draw_artist(self.image)
+
+    def blit_image(self):
+        "Redraws only the image artist over the cached background."
+        if self.background is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        self.ax.draw_artist(self.image)
+        self.canvas.blit(self.ax.bbox)
 
     def transpose_image(self):
         # TODO
@@ -447,6 +1395,33 @@ class ImageViewer(QTW.QWidget):
 
     def set_timer_interval(self, fps):
         self.timer_interval = 1e3/fps
+        if self.timer is not None:
+            self.timer.setInterval(round(self.timer_interval))
+            self.start_playback_clock()
+
+    def start_playback_clock(self):
+        "Playback positions are counted from now and the current frame."
+        dim_i = self.dim_selector.dynamic_dimension()
+        self.play_start = (time.perf_counter(), self.dim_selector.dim_spinboxes[dim_i].value())
+
+    def animation_step(self):
+        """
+        Shows the frame that is due at the requested frame rate. Positions
+        follow the clock rather than counting timer ticks, so slow rendering
+        skips frames (counted as dropped) instead of slowing playback down.
+        """
+        dim_i = self.dim_selector.dynamic_dimension()
+        spinbox = self.dim_selector.dim_spinboxes[dim_i]
+        n = spinbox.maximum() + 1
+        if n <= 1:
+            return
+        t0, i0 = self.play_start
+        due = (i0 + int((time.perf_counter() - t0) * self.frameRate.value())) % n
+        step = (due - spinbox.value()) % n
+        if step == 0:
+            return
+        self.frames_dropped += step - 1
+        spinbox.setValue(due)
 
     def animate_frames(self):
         """
@@ -457,6 +1432,7 @@ class ImageViewer(QTW.QWidget):
             if self.timer:
                 self.timer.stop()
                 self.timer = None
+                self.label.setText("")
             
             pixmapi = QTW.QStyle.StandardPixmap.SP_MediaPlay
             icon = self.style().standardIcon(pixmapi)
@@ -469,19 +1445,26 @@ class ImageViewer(QTW.QWidget):
         icon = self.style().standardIcon(pixmapi)
         self.animate.setIcon(icon)
 
+        if dim_i == self.dim_selector.reduction_dimension():
+            logging.warning("Cannot animate the projected dimension.")
+            self.animate.setChecked(False)
+            return
+
+        if self.grid is not None and dim_i == self.ndim - 1:
+            logging.warning("Cannot animate the grid panels.")
+            self.animate.setChecked(False)
+            return
+
         if self.dim_selector.dim_spinboxes[dim_i].maximum() == 0:
             logging.warning("Cannot animate singleton dimension.")
             self.animate.setChecked(False)
             return
 
-        def increment():
-            v = self.dim_selector.dim_spinboxes[dim_i].value()
-            m = self.dim_selector.dim_spinboxes[dim_i].maximum()
-            self.dim_selector.dim_spinboxes[dim_i].setValue((v+1) % m)
-
+        self.start_playback_clock()
         self.timer = QtCore.QTimer(self)
-        self.timer.setInterval(self.timer_interval)
-        self.timer.timeout.connect(increment)
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.timer.setInterval(round(self.timer_interval))
+        self.timer.timeout.connect(self.animation_step)
         self.timer.start()
 
     @Slot()
@@ -495,8 +1478,8 @@ class ImageViewer(QTW.QWidget):
         movie_filename, _ = QTW.QFileDialog.getSaveFileName(
             self,
             "Save Movie As...",
-            f"movie_{dim_i}_{framerate}fps.mp4",
-            "MP4 Files (*.mp4);;All Files (*)",
+            f"movie_{dim_i}_{framerate}fps.{'mp4' if shutil.which('ffmpeg') else 'gif'}",
+            "MP4 Files (*.mp4);;GIF Files (*.gif);;Animated PNG (*.apng);;NPY Stack (*.npy);;All Files (*)",
             options=options
         )
 
@@ -504,31 +1487,101 @@ class ImageViewer(QTW.QWidget):
             logging.info("Save movie operation canceled.")
             return
 
-        logging.info(f"Saving the movie from dim {dim_i} with frame rate {framerate} fps as the filename {movie_filename}")
+        self.export_movie(movie_filename, framerate)
 
-        fig = plt.figure(frameon=False)
-        w,h = self.current_frame().shape[0:2]
-        dpi = 96
-        w /= dpi
-        h /= dpi
-        fig.set_dpi(dpi)
-        fig.set_size_inches(w,h)
-        ax = plt.Axes(fig, [0., 0., 1., 1.])
-        ax.set_axis_off()
-        fig.add_axes(ax)
-        im_ax = []
-
-        n_frames = self.dim_selector.dim_spinboxes[dim_i].maximum()
-        self.data[self.dim_selector.get_current_slices()].squeeze()
-        slcs = self.dim_selector.get_current_slices()
-        for ii in range(n_frames):
+    def movie_frames(self, slcs, dim_i, state, wl, cmap):
+        """
+        Yields every frame along dim_i rendered to uint8 RGB(A) with the given
+        display settings. Uses its own LUT renderer, so it can run on a worker
+        thread while the viewer keeps drawing.
+        """
+        renderer = LutRenderer()
+        lut = get_lut(cmap)
+        for ii in range(self.image_shape()[dim_i]):
             slcs_ = (*slcs[:dim_i], slice(ii, ii+1), *slcs[dim_i+1:])
-            im_ = self.data[slcs_].squeeze()
-            im_ = self.prep_image_to_display(im_)
-            ima_ = ax.imshow(im_, cmap='gray', animated=True, vmin=self.window_level()[0], vmax=self.window_level()[1], aspect='equal')
-            im_ax.append([ima_])
-
-        ani = animation.ArtistAnimation(fig, im_ax, interval=1e3/framerate, blit=True)
-        MWriter = animation.FFMpegWriter(fps=framerate)
-        ani.save(movie_filename, writer=MWriter)
-        logging.info(f"Movie saved as {movie_filename}")
\ No newline at end of file
+            frame = self.compute_frame(slcs_, state)
+            if frame.ndim == 3:
+                yield renderer.render_rgb(frame)
+            else:
+                yield renderer.render(frame, wl[0], wl[1], lut)
+
+    def export_movie(self, movie_filename, framerate, background=True):
+        """
+        Streams all frames along the dynamic dimension to movie_filename with
+        the current colormap and window/level, one frame in memory at a time.
+        With background, frames are rendered and encoded on a worker thread
+        and the viewer stays responsive; the progress dialog can cancel.
+        """
+        try:
+            movie_backend(movie_filename)
+        except (RuntimeError, ValueError) as e:
+            self.export_failed(str(e))
+            return
+        dim_i = self.dim_selector.dynamic_dimension()
+        n_frames = self.image_shape()[dim_i]
+        state = self.view_state()._replace(factor=1)
+        if self.grid is None:
+            state = state._replace(montage=None)
+        frames = self.movie_frames(self.display_slices() if self.grid is not None
+                                   else self.dim_selector.get_current_slices(),
+                                   dim_i, state, self.window_level(), self.cmap)
+        logging.info(f"Saving the movie from dim {dim_i} with frame rate {framerate} fps as the filename {movie_filename}")
+
+        dialog = QTW.QProgressDialog("Saving movie...", "Cancel", 0, n_frames, self)
+        dialog.setWindowModality(QtCore.Qt.WindowModal if not background else QtCore.Qt.NonModal)
+        dialog.setMinimumDuration(0)
+        cancelled = threading.Event()
+        dialog.canceled.connect(cancelled.set)
+
+        if not background:
+            def progress(i):
+                dialog.setValue(i)
+                return not dialog.wasCanceled()
+            error = None
+            try:
+                write_movie(frames, movie_filename, framerate, n_frames, progress)
+                logging.info(f"Movie saved as {movie_filename}")
+            except ExportCancelled:
+                logging.info("Save movie operation canceled.")
+            except Exception as e:
+                error = f"Could not save {movie_filename}: {e}"
+            dialog.close()
+            if error is not None:
+                self.export_failed(error)
+            return
+
+        reporter = ExportProgress()
+        reporter.progress.connect(dialog.setValue)
+
+        def progress(i):
+            reporter.progress.emit(i)
+            return not cancelled.is_set()
+
+        def run():
+            try:
+                write_movie(frames, movie_filename, framerate, n_frames, progress)
+            except ExportCancelled:
+                return True, "Save movie operation canceled."
+            except Exception as e:
+                return False, f"Could not save {movie_filename}: {e}"
+            return True, f"Movie saved as {movie_filename}"
+
+        def done(result):
+            ok, message = result
+            dialog.close()
+            if ok:
+                logging.info(message)
+            else:
+                self.export_failed(message)
+
+        workers.submit(run, callback=done, owner=dialog)
+
+    def export_failed(self, message):
+        "Reports a movie export that could not be written."
+        logging.error(message)
+        QTW.QMessageBox.warning(self, "Save Movie", message)
+
+
+class ExportProgress(QtCore.QObject):
+    "Reports export progress from the worker thread to the dialog (queued)."
+    progress = QtCore.Signal(int)
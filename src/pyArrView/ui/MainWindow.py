@@ -5,16 +5,20 @@ from PySide6 import QtWidgets
 from PySide6.QtCore import Signal, Slot
 
 from .ImageViewer import ImageViewer
-from matplotlib import colormaps
 
 
 class MainWindow(QtWidgets.QMainWindow):
 
     change_cmap = Signal(str)
     save_video = Signal()
+    change_backend = Signal(str)
+    change_scaling = Signal(str)
+    show_hud = Signal(bool)
 
-    def __init__(self, array):
+    def __init__(self, array, grid=None):
         super().__init__()
+        # Columns of a grid of arrays (see ImageViewer), kept when the data changes
+        self.grid = grid
 
         self.setUnifiedTitleAndToolBarOnMac(True)
 
@@ -26,7 +30,20 @@ class MainWindow(QtWidgets.QMainWindow):
         # View menu
         self.view_menu = super().menuBar().addMenu("&View")
         self.cmap_menu = self.view_menu.addMenu("&Colormap")
-        self.populate_cmap_menu()
+        # Filled when first opened: one action per matplotlib colormap is
+        # slow to build and needs matplotlib, which startup can do without.
+        self.cmap_menu.aboutToShow.connect(self.populate_cmap_menu)
+        self.native_action = self.view_menu.addAction("&Native Rendering")
+        self.native_action.setCheckable(True)
+        self.native_action.setChecked(ImageViewer.backend == 'qimage')
+        self.native_action.toggled.connect(self.backend_change_requested)
+        self.frame_scaling_action = self.view_menu.addAction("&Per-Frame Scaling")
+        self.frame_scaling_action.setCheckable(True)
+        self.frame_scaling_action.setChecked(ImageViewer.scaling == 'frame')
+        self.frame_scaling_action.toggled.connect(self.scaling_change_requested)
+        self.hud_action = self.view_menu.addAction("Performance &HUD")
+        self.hud_action.setCheckable(True)
+        self.hud_action.toggled.connect(self.show_hud)
 
         # Help menu
         self.help_menu = super().menuBar().addMenu("&Help")
@@ -34,7 +51,28 @@ class MainWindow(QtWidgets.QMainWindow):
         self.help_menu.addAction("&Shortcuts", self.shortcuts_dialog)
         self.help_menu.addAction("&About", self.about_dialog)
         
-        self.setCentralWidget(ImageViewer(parent=self, array=array))
+        self.viewer = ImageViewer(parent=self, array=array, grid=grid)
+        self.setCentralWidget(self.viewer)
+
+    def set_data(self, array):
+        """
+        Shows new data. Same-shaped data keeps the viewer and its slice and
+        display settings, otherwise a new viewer is built with the colormap
+        and view mode carried over where possible.
+        """
+        if array.shape == self.viewer.data.shape:
+            self.viewer.set_data(array)
+            return
+        old = self.viewer
+        self.viewer = ImageViewer(parent=self, array=array, grid=self.grid)
+        self.viewer.set_view(cmap=old.cmap, backend=old.backend,
+                             view=old.viewmode_box.currentText(), scaling=old.scaling)
+        self.viewer.set_hud(self.hud_action.isChecked())
+        self.setCentralWidget(self.viewer)
+
+    def refresh_data(self):
+        "The data was modified in place, redraw it."
+        self.viewer.set_data(None)
 
     def usage_dialog(self):
         QtWidgets.QMessageBox.information(self, "Usage", "Usage")
@@ -45,7 +83,11 @@ class MainWindow(QtWidgets.QMainWindow):
     def about_dialog(self):
         QtWidgets.QMessageBox.information(self, "About", "About")
 
+    @Slot()
     def populate_cmap_menu(self):
+        if not self.cmap_menu.isEmpty():
+            return
+        from matplotlib import colormaps
         cmap_list = list(colormaps)
 
         for cmap in cmap_list:
@@ -58,6 +100,14 @@ class MainWindow(QtWidgets.QMainWindow):
         cmap = action.text()
         self.change_cmap.emit(cmap)
 
+    @Slot(bool)
+    def backend_change_requested(self, native):
+        self.change_backend.emit('qimage' if native else 'matplotlib')
+
+    @Slot(bool)
+    def scaling_change_requested(self, per_frame):
+        self.change_scaling.emit('frame' if per_frame else 'global')
+
     @Slot()
     def save_video_requested(self):
         self.save_video.emit()
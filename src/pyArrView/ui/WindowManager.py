@@ -0,0 +1,131 @@
+import logging
+import itertools
+import threading
+from PySide6.QtCore import Qt, QObject, Signal, Slot
+from PySide6 import QtWidgets
+
+from .MainWindow import MainWindow
+from .. import protocol, transport
+from ..profiling import span
+
+
+class WindowManager(QObject):
+    """
+    Receives commands from av() and owns the viewer windows of the process.
+    A reader thread blocks on each connection and hands every command to the
+    GUI thread through a queued signal, so the process sleeps while idle and
+    reacts as soon as a command arrives.
+
+    Window ids are chosen by the calling process, so they are kept apart per
+    connection. A persistent manager (the daemon, see pyArrView.daemon)
+    serves many connections and keeps running, windows included, when one
+    goes away; otherwise losing the connection quits.
+    """
+
+    received = Signal(object)
+
+    def __init__(self, conn, app: QtWidgets.QApplication, persistent=False):
+        super().__init__()
+        self.app = app
+        self.persistent = persistent
+        self.clients = itertools.count()
+        self.windows = {}
+        # Window id -> source of the data it shows, released with the window
+        self.sources = {}
+        self.handlers = {
+            protocol.CreateWindow: self.create_window,
+            protocol.UpdateData: self.update_data,
+            protocol.SetTitle: self.set_title,
+            protocol.SetView: self.set_view,
+            protocol.CloseWindow: self.close_window,
+            protocol.Shutdown: self.shutdown,
+        }
+        self.received.connect(self.dispatch)
+        if conn is not None:
+            self.listen(conn)
+
+    def listen(self, conn):
+        "Starts a reader thread for a connection. May be called from any thread."
+        threading.Thread(target=self.read_commands, args=(conn, next(self.clients)),
+                         name='pyArrView-commands', daemon=True).start()
+
+    def read_commands(self, conn, client):
+        "Runs on the reader thread. Unpickling happens here, off the GUI thread."
+        while True:
+            try:
+                # Wait first, so the span only covers reading and unpickling.
+                conn.poll(None)
+                with span('ipc receive'):
+                    cmd = conn.recv()
+            except (EOFError, OSError):
+                # The calling process is gone.
+                conn.close()
+                if not self.persistent:
+                    self.received.emit(protocol.Shutdown())
+                return
+            if 'window_id' in getattr(cmd, '_fields', ()):
+                cmd = cmd._replace(window_id=(client, cmd.window_id))
+            self.received.emit(cmd)
+
+    @Slot(object)
+    def dispatch(self, cmd):
+        handler = self.handlers.get(type(cmd))
+        if handler is None:
+            logging.warning(f"Unknown command {cmd!r}")
+            return
+        handler(cmd)
+
+    def create_window(self, cmd: protocol.CreateWindow):
+        with span('open array'):
+            array = transport.open_array(cmd.source)
+        main = MainWindow(array, grid=cmd.grid)
+        main.setWindowTitle(cmd.title)
+        main.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        main.destroyed.connect(lambda _=None, i=cmd.window_id: self.window_destroyed(i))
+        self.windows[cmd.window_id] = main
+        self.sources[cmd.window_id] = cmd.source
+        main.resize(800, 600)
+        main.show()
+        main.raise_()
+        main.activateWindow()
+
+    def window_destroyed(self, window_id):
+        self.windows.pop(window_id, None)
+        transport.release_array(self.sources.pop(window_id, None))
+
+    def update_data(self, cmd: protocol.UpdateData):
+        main = self.windows.get(cmd.window_id)
+        if main is None:
+            # Window was closed by the user; the new buffer is ours to free.
+            transport.release_array(cmd.source)
+            return
+        if cmd.source is None:
+            main.refresh_data()
+            return
+        with span('open array'):
+            array = transport.open_array(cmd.source)
+        main.set_data(array)
+        transport.release_array(self.sources.get(cmd.window_id))
+        self.sources[cmd.window_id] = cmd.source
+
+    def set_title(self, cmd: protocol.SetTitle):
+        main = self.windows.get(cmd.window_id)
+        if main is not None:
+            main.setWindowTitle(cmd.title)
+
+    def set_view(self, cmd: protocol.SetView):
+        main = self.windows.get(cmd.window_id)
+        if main is not None:
+            main.viewer.set_view(**cmd.options)
+
+    def close_window(self, cmd: protocol.CloseWindow):
+        main = self.windows.get(cmd.window_id)
+        if main is not None:
+            main.close()
+
+    def shutdown(self, cmd=None):
+        # Close all windows first
+        for w in list(self.windows.values()):
+            w.close()
+        # Quit the application
+        self.app.quit()
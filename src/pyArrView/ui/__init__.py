@@ -1,4 +1,5 @@
 from .MainWindow import MainWindow
 from .DimensionSelector import DimensionSelector
+from .WindowManager import WindowManager
 
-__all__ = ["MainWindow", "DimensionSelector"]
\ No newline at end of file
+__all__ = ["MainWindow", "DimensionSelector", "WindowManager"]
\ No newline at end of file
@@ -0,0 +1,69 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import shiboken6
+from PySide6.QtCore import QObject, Signal
+
+# Shared by all viewers of the process. NumPy releases the GIL for the heavy
+# parts, so threads are enough to keep the GUI thread free. Frames the user
+# is waiting for run on the 'compute' pool, so they never queue behind
+# background work (prefetch, projections, export). Whole-array statistics
+# run on the 'stats' pool with few threads, so a scan of a large array
+# neither queues ahead of them nor holds many chunks in memory at once.
+_executors = {}
+
+# Threads of pools that are not the ThreadPoolExecutor default.
+POOL_THREADS = {'stats': 2}
+
+
+def executor(pool='background'):
+    ex = _executors.get(pool)
+    if ex is None:
+        ex = _executors[pool] = ThreadPoolExecutor(POOL_THREADS.get(pool),
+                                                   thread_name_prefix=f'pyArrView-{pool}')
+    return ex
+
+
+class _Relay(QObject):
+    "Carries results from worker threads back to the GUI thread (queued signal)."
+    finished = Signal(object, object, object)
+
+    def __init__(self):
+        super().__init__()
+        self.finished.connect(self.deliver)
+
+    def deliver(self, callback, result, owner=None):
+        # Drop results for widgets closed while the task was running.
+        if owner is None:
+            owner = getattr(callback, '__self__', None)
+        if isinstance(owner, QObject) and not shiboken6.isValid(owner):
+            return
+        callback(result)
+
+
+_relay = None
+
+
+def submit(fn, *args, callback=None, owner=None, pool='background'):
+    """
+    Runs fn(*args) on a worker pool. If given, callback(result) is called
+    on the GUI thread once it finishes, unless owner (by default the object
+    callback is bound to) has been deleted by then. Returns the Future.
+    """
+    global _relay
+    if _relay is None:
+        _relay = _Relay()
+    relay = _relay
+
+    def done(future):
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is not None:
+            logging.error(f"Background task {getattr(fn, '__name__', fn)} failed: {exc!r}")
+            return
+        if callback is not None:
+            relay.finished.emit(callback, future.result(), owner)
+
+    future = executor(pool).submit(fn, *args)
+    future.add_done_callback(done)
+    return future